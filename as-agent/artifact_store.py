@@ -0,0 +1,190 @@
+"""Artifact store shared by the research agent and the report viewer.
+
+Every research run gets its own directory under outputs/runs/, named by a
+run ID that cannot collide with a concurrent run. The directory holds the
+Markdown report, the PDF, the JSON sidecars (location restrictions and the
+section state with the raw API responses) and a manifest.json listing them.
+Every file is written to a temporary name and renamed into place, so a
+reader never sees a partial file. When a run finishes its manifest is
+appended to outputs/runs/index.jsonl, which lets the viewer find every
+report by reading one file.
+"""
+import os
+import re
+import json
+import secrets
+import threading
+from datetime import datetime
+from pathlib import Path
+
+ARTIFACT_DIR = Path(__file__).parent / "outputs" / "runs"
+INDEX_FILENAME = "index.jsonl"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def clean_company_name(company_name):
+    """Return the company name as used in file and directory names."""
+    return re.sub(r'[^\w\s-]', '', company_name).strip().replace(' ', '_')
+
+def atomic_write_text(path, text):
+    """Write a text file through a temporary file and rename it into place."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    tmp_path.replace(path)
+    return path
+
+def atomic_write_json(path, data):
+    """Write a JSON file through a temporary file and rename it into place."""
+    return atomic_write_text(path, json.dumps(data, indent=2))
+
+def artifact_name(manifest, kind):
+    """Return the file name of the first artifact of a kind in a manifest, or None."""
+    for artifact in manifest.get("artifacts", []):
+        if artifact["kind"] == kind:
+            return artifact["name"]
+    return None
+
+class ArtifactRun:
+    """The directory and manifest of one research run."""
+    
+    def __init__(self, store, run_id, company_name):
+        self.store = store
+        self.run_id = run_id
+        self.path = store.root / run_id
+        self.manifest = {
+            "version": MANIFEST_VERSION,
+            "run_id": run_id,
+            "company_name": company_name,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "status": "running",
+            "artifacts": [],
+        }
+        self._lock = threading.Lock()
+    
+    def temp_path(self, name):
+        """Return a temporary path for a file that is written by another library, for add_file()."""
+        return self.path / f".{name}.{threading.get_ident()}.tmp"
+    
+    def write_text(self, name, text, kind):
+        """Write a text artifact and return its path."""
+        path = atomic_write_text(self.path / name, text)
+        self._record(name, kind, path)
+        return path
+    
+    def write_json(self, name, data, kind):
+        """Write a JSON artifact and return its path."""
+        path = atomic_write_json(self.path / name, data)
+        self._record(name, kind, path)
+        return path
+    
+    def add_file(self, tmp_path, name, kind):
+        """Rename a file written at temp_path(name) into place and record it."""
+        path = Path(tmp_path).replace(self.path / name)
+        self._record(name, kind, path)
+        return path
+    
+    def _record(self, name, kind, path):
+        with self._lock:
+            self.manifest["artifacts"] = [a for a in self.manifest["artifacts"] if a["name"] != name]
+            self.manifest["artifacts"].append({"name": name, "kind": kind, "bytes": path.stat().st_size})
+            self._write_manifest()
+            self._reindex()
+    
+    def update(self, **fields):
+        """Add summary fields to the manifest, such as the restriction level shown by the viewer."""
+        with self._lock:
+            self.manifest.update(fields)
+            self._write_manifest()
+            self._reindex()
+    
+    def _write_manifest(self):
+        atomic_write_json(self.path / MANIFEST_FILENAME, self.manifest)
+    
+    def _reindex(self):
+        # Changes after the run finished, such as a PDF rendered in the background, supersede its index entry
+        if self.manifest["finished_at"]:
+            self.store.append_index(self.manifest)
+    
+    def finish(self, status="complete"):
+        """Mark the run finished and add it to the store index."""
+        with self._lock:
+            self.manifest["status"] = status
+            self.manifest["finished_at"] = datetime.now().isoformat()
+            self._write_manifest()
+        self.store.append_index(self.manifest)
+
+class ArtifactStore:
+    """Run directories and the index of finished runs."""
+    
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = Path(root)
+        self.index_path = self.root / INDEX_FILENAME
+        self._lock = threading.Lock()
+    
+    def create_run(self, company_name):
+        """Create the directory for a new run and return it."""
+        self.root.mkdir(exist_ok=True, parents=True)
+        prefix = f"{clean_company_name(company_name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        while True:
+            # The random suffix keeps runs started in the same second apart; mkdir fails on the rare clash
+            run_id = f"{prefix}_{secrets.token_hex(3)}"
+            try:
+                (self.root / run_id).mkdir()
+            except FileExistsError:
+                continue
+            run = ArtifactRun(self, run_id, company_name)
+            run._write_manifest()
+            return run
+    
+    def append_index(self, manifest):
+        """Append a finished run's manifest to the index as one line; the last line for a run wins."""
+        line = json.dumps(manifest) + "\n"
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+    
+    def read_index(self):
+        """Return the manifest of every finished run whose directory still exists, oldest first."""
+        manifests = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        manifest = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash mid-write can leave a truncated last line
+                        continue
+                    manifests[manifest["run_id"]] = manifest
+        except FileNotFoundError:
+            return []
+        return [manifest for run_id, manifest in manifests.items() if (self.root / run_id).is_dir()]
+    
+    def runs_for(self, company_name):
+        """Return the finished runs for a company, newest first."""
+        key = clean_company_name(company_name).lower()
+        runs = [m for m in self.read_index() if clean_company_name(m["company_name"]).lower() == key]
+        return sorted(runs, key=lambda m: m["created_at"], reverse=True)
+    
+    def artifact_path(self, manifest, kind):
+        """Return the path of a run's artifact of the given kind, or None."""
+        name = artifact_name(manifest, kind)
+        return self.root / manifest["run_id"] / name if name else None
+
+_store = None
+
+def get_artifact_store():
+    """Return the shared artifact store."""
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
+
+def configure_artifact_store(root):
+    """Point the shared artifact store at another directory, e.g. for benchmarks."""
+    global _store
+    _store = ArtifactStore(root)
+    return _store
@@ -0,0 +1,156 @@
+"""Batch mode for the company research agent.
+
+Reads companies from a CSV or JSONL file and researches several of them in
+parallel. Every finished company is appended to a progress file, so running
+the same command again after a crash skips the companies that already have a
+report and retries the rest.
+"""
+import csv
+import json
+import time
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Columns read from each input row
+BATCH_FIELDS = ["company_name", "company_url", "additional_info", "interest_reason"]
+
+# Progress files live next to the other agent outputs
+PROGRESS_DIR = Path(__file__).parent / "outputs" / "batch"
+
+def load_batch_input(input_path):
+    """Load company rows from a CSV (with a header row) or JSONL file."""
+    input_path = Path(input_path)
+    rows = []
+    
+    with open(input_path, 'r', encoding="utf-8") as f:
+        if input_path.suffix.lower() in (".jsonl", ".ndjson"):
+            records = []
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Skipping invalid JSON on line {line_number}: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    print(f"Warning: Skipping line {line_number}, expected a JSON object")
+                    continue
+                records.append(record)
+        else:
+            records = list(csv.DictReader(f))
+    
+    for record in records:
+        # JSONL values may be numbers or other non-string types
+        row = {field: str(record.get(field) or "").strip() for field in BATCH_FIELDS}
+        if not row["company_name"]:
+            print(f"Warning: Skipping row without a company_name: {record}")
+            continue
+        rows.append(row)
+    
+    return rows
+
+def row_key(row):
+    """Return a stable key identifying a company row across runs."""
+    identity = f"{row['company_name'].lower()}|{row['company_url'].lower()}|{row['additional_info'].lower()}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+def load_completed(progress_path):
+    """Return the keys of rows that already finished successfully."""
+    completed = set()
+    if not progress_path.exists():
+        return completed
+    
+    with open(progress_path, 'r', encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line
+                continue
+            if entry.get("status") == "done":
+                completed.add(entry["key"])
+    
+    return completed
+
+def record_progress(progress_path, entry):
+    """Append a progress entry and flush it to disk immediately."""
+    with open(progress_path, 'a', encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+
+def run_batch(input_path, research_fn, workers=2, progress_path=None, skip_completed=True, prefetch_fn=None):
+    """Research every company in the input file.
+    
+    research_fn is called as research_fn(company_name, company_url,
+    additional_info, interest_reason) and must return the report path.
+    Companies already done in the progress file are skipped unless
+    skip_completed is False. prefetch_fn, if given, is called with the rows
+    still to research on a separate thread while research runs. Returns a
+    (succeeded, failed, skipped) tuple of counts.
+    """
+    rows = load_batch_input(input_path)
+    
+    if progress_path is None:
+        PROGRESS_DIR.mkdir(exist_ok=True, parents=True)
+        progress_path = PROGRESS_DIR / f"{Path(input_path).stem}.progress.jsonl"
+    progress_path = Path(progress_path)
+    
+    completed = load_completed(progress_path) if skip_completed else set()
+    pending = [row for row in rows if row_key(row) not in completed]
+    skipped = len(rows) - len(pending)
+    
+    print(f"\nLoaded {len(rows)} companies from {input_path}")
+    if skipped:
+        print(f"Resuming: {skipped} companies already completed, {len(pending)} remaining")
+    print(f"Progress is recorded in {progress_path}")
+    
+    succeeded = 0
+    failed = 0
+    started = time.time()
+    
+    def process(row):
+        return research_fn(row["company_name"], row["company_url"],
+                           row["additional_info"], row["interest_reason"] or None)
+    
+    # The prefetch runs alongside research; a company reaching a lookup in progress waits for it
+    prefetch_executor = ThreadPoolExecutor(max_workers=1)
+    prefetch_future = prefetch_executor.submit(prefetch_fn, pending) if prefetch_fn and pending else None
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(process, row): row for row in pending}
+        for future in as_completed(futures):
+            row = futures[future]
+            entry = {
+                "key": row_key(row),
+                "company_name": row["company_name"],
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            try:
+                report_path = future.result()
+                entry.update({"status": "done", "report_path": str(report_path)})
+                succeeded += 1
+            except Exception as e:
+                entry.update({"status": "failed", "error": str(e)})
+                failed += 1
+            record_progress(progress_path, entry)
+            
+            finished = succeeded + failed
+            elapsed = time.time() - started
+            remaining = (elapsed / finished) * (len(pending) - finished)
+            print(f"\n[{finished + skipped}/{len(rows)}] {row['company_name']}: {entry['status']} "
+                  f"(elapsed {elapsed:.0f}s, ~{remaining:.0f}s remaining)")
+    
+    prefetch_executor.shutdown(wait=True)
+    if prefetch_future and prefetch_future.exception():
+        print(f"Warning: Prefetch failed: {prefetch_future.exception()}")
+    
+    print("\n" + "=" * 80)
+    print(f"Batch complete: {succeeded} succeeded, {failed} failed, {skipped} skipped")
+    if failed:
+        print("Run the same command again to retry the failed companies.")
+    print("=" * 80 + "\n")
+    
+    return succeeded, failed, skipped
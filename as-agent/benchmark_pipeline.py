@@ -0,0 +1,369 @@
+"""Offline end-to-end benchmark of the research pipeline.
+
+Starts a local HTTP server that stands in for the Perplexity and OpenRouter
+chat-completions endpoints and the Hunter.io domain search, points the
+agent at it through the *_API_URL environment overrides and runs the full
+batch pipeline through company_research.main() on generated companies. The
+server's latency, jitter, 429 rate and answer size are configurable, so no
+API credits are used and runs are repeatable with a fixed seed.
+
+Reports companies per minute, p50/p95 latency per pipeline stage and peak
+Python memory (tracemalloc). All outputs go to a temporary directory.
+
+Usage:
+    python benchmark_pipeline.py --companies 20 --workers 4
+    python benchmark_pipeline.py --latency 1.5 --jitter 0.5 --rate-429 0.05 --payload-chars 6000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from functools import wraps
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from query_plans import SECTION_DELIMITER, SECTION_PATTERN
+
+BENCHMARK_OUTPUT_DIR = Path(__file__).parent / "outputs" / "benchmarks"
+
+# Text that gives the location rules something to find in every research answer
+RESEARCH_TEXT = (
+    "The company is remote-first and hires in the European Union and the United States. "
+    "Employees are expected to overlap with CET working hours. "
+)
+FILLER_TEXT = "The team ships product updates every week and publishes its roadmap openly. "
+
+# Pipeline functions in company_research timed as stages
+STAGE_FUNCTIONS = {
+    "research_company": "company",
+    "search_perplexity": "llm_request",
+    "search_openrouter": "llm_request",
+    "fetch_company_facts": "company_facts",
+    "generate_cover_letter": "cover_letter",
+    "search_hunter_io": "hunter_lookup",
+    "extract_location_restrictions": "location_extraction",
+    "generate_report": "report",
+    "save_report": "save",
+}
+
+class MockApiServer:
+    """Local stand-in for the chat-completions and domain-search endpoints."""
+    
+    def __init__(self, latency=0.5, jitter=0.2, rate_429=0.0, payload_chars=4000, emails_per_domain=30, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.payload_chars = payload_chars
+        self.emails_per_domain = emails_per_domain
+        self.random = random.Random(seed)
+        self.counts = {"chat": 0, "hunter": 0, "throttled": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+    
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _draw(self):
+        """Return (throttle, delay) for one request."""
+        with self._lock:
+            throttle = self.random.random() < self.rate_429
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        return throttle, delay
+    
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+    
+    def chat_answer(self, payload):
+        """Return the message content for a chat-completions request."""
+        schema = ((payload.get("response_format") or {}).get("json_schema") or {}).get("schema") or {}
+        properties = schema.get("properties", {})
+        if "cover_letter" in properties:
+            return json.dumps({
+                "cover_letter": "I have followed your remote-first approach for years. " * 4,
+                "subject_lines": ["Remote engineer application", "Joining your team", "Experienced remote engineer"],
+            })
+        if "remote_policy" in properties:
+            return json.dumps({
+                "website": "https://example.com",
+                "headquarters": "Berlin, Germany",
+                "company_size": "medium",
+                "employee_count": 250,
+                "description": "A software company building developer tools.",
+                "remote_policy": "remote_first",
+                "remote_policy_summary": "Remote-first with optional offices.",
+                "restricted_to": ["EU", "US"],
+                "excluded_regions": [],
+                "time_zone_requirements": ["CET"],
+            })
+        
+        # A consolidated query gets one delimited section per title, sharing the answer size
+        prompt = (payload.get("messages") or [{}])[-1].get("content") or ""
+        titles = [match.group(1) for match in SECTION_PATTERN.finditer(prompt)]
+        if titles:
+            chars = self.payload_chars // len(titles)
+            return "\n\n".join(f"{SECTION_DELIMITER.format(title=title)}\n{self.research_text(chars)}"
+                                 for title in titles)
+        return self.research_text(self.payload_chars)
+    
+    def research_text(self, chars):
+        """Return research prose of about the given length."""
+        text = RESEARCH_TEXT
+        while len(text) < chars:
+            text += FILLER_TEXT
+        return text[:max(chars, len(RESEARCH_TEXT))]
+    
+    def hunter_page(self, params):
+        """Return one page of a domain search."""
+        domain = params.get("domain", ["example.com"])[0]
+        offset = int(params.get("offset", ["0"])[0])
+        limit = int(params.get("limit", ["10"])[0])
+        positions = ["Talent Acquisition Lead", "Chief Executive Officer", "Software Engineer", "Designer"]
+        emails = [
+            {
+                "value": f"person{i}@{domain}",
+                "type": "generic" if i % 7 == 0 else "personal",
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "position": positions[i % len(positions)],
+            }
+            for i in range(offset, min(offset + limit, self.emails_per_domain))
+        ]
+        return {"data": {"domain": domain, "emails": emails}, "meta": {"results": self.emails_per_domain}}
+    
+    def _handler_class(self):
+        mock = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real APIs, so the agent's connection pools are exercised
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _throttled(self):
+                throttle, delay = mock._draw()
+                if throttle:
+                    mock._count("throttled")
+                    self._send_json(429, {"error": "rate limited"}, {"Retry-After": "0"})
+                    return True
+                time.sleep(delay)
+                return False
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self._throttled():
+                    return
+                mock._count("chat")
+                content = mock.chat_answer(payload)
+                usage = {"prompt_tokens": len(json.dumps(payload)) // 4, "completion_tokens": len(content) // 4}
+                
+                if payload.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    for start in range(0, len(content), 200):
+                        chunk = {"choices": [{"delta": {"content": content[start:start + 200]}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    final = {"choices": [{"delta": {}}], "usage": usage, "citations": ["https://example.com/about"]}
+                    self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                    self.close_connection = True
+                    return
+                
+                self._send_json(200, {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "citations": ["https://example.com/about"],
+                    "usage": usage,
+                })
+            
+            def do_GET(self):
+                if self._throttled():
+                    return
+                mock._count("hunter")
+                self._send_json(200, mock.hunter_page(parse_qs(urlparse(self.path).query)))
+        
+        return Handler
+
+class StageTimer:
+    """Records the duration of every call to the pipeline functions it wraps."""
+    
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+        self._originals = []
+    
+    def wrap(self, module, functions):
+        for name, stage in functions.items():
+            original = getattr(module, name)
+            setattr(module, name, self._timed(original, stage))
+            self._originals.append((module, name, original))
+    
+    def restore(self):
+        for module, name, original in reversed(self._originals):
+            setattr(module, name, original)
+        self._originals = []
+    
+    def _timed(self, function, stage):
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.durations.setdefault(stage, []).append(elapsed)
+        return timed
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize_stages(durations):
+    """Return count, p50, p95 and max seconds per stage."""
+    return {
+        stage: {
+            "count": len(values),
+            "p50": round(percentile(values, 0.50), 4),
+            "p95": round(percentile(values, 0.95), 4),
+            "max": round(max(values), 4),
+        }
+        for stage, values in sorted(durations.items())
+    }
+
+def write_companies(path, count):
+    """Write a batch input file with generated companies."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("company_name,company_url,additional_info,interest_reason\n")
+        for i in range(count):
+            f.write(f"Benchmark Company {i:03d},https://company{i:03d}.example,developer tools,"
+                    "I want to work on remote-first developer tools\n")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the research pipeline against local mock APIs.")
+    parser.add_argument("--companies", type=int, default=10, help="Companies to research (default: 10)")
+    parser.add_argument("--workers", type=int, default=2, help="Companies researched in parallel (default: 2)")
+    parser.add_argument("--max-inflight", type=int, default=8, help="Maximum API requests in flight (default: 8)")
+    parser.add_argument("--query-plan", choices=("split", "consolidated"), default="split")
+    parser.add_argument("--hedge-after", type=float, help="Passed to company_research.py --hedge-after")
+    parser.add_argument("--stream", action="store_true", help="Use streaming responses")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean mock API latency in seconds (default: 0.5)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Uniform latency jitter in seconds (default: 0.2)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429 (default: 0)")
+    parser.add_argument("--payload-chars", type=int, default=4000,
+                        help="Characters per research answer, shared by the sections of a consolidated answer "
+                             "(default: 4000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and 429 draws (default: 0)")
+    parser.add_argument("--real-rate-limits", action="store_true",
+                        help="Keep the agent's per-provider request rates instead of lifting them")
+    parser.add_argument("--output", help="Where to write the JSON results; defaults to outputs/benchmarks/")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    mock = MockApiServer(args.latency, args.jitter, args.rate_429, args.payload_chars, seed=args.seed).start()
+    
+    # The agent reads its endpoints, keys and rate limits at import, so they are set before importing it
+    os.environ["PERPLEXITY_API_URL"] = f"{mock.url}/perplexity/chat/completions"
+    os.environ["OPENROUTER_API_URL"] = f"{mock.url}/openrouter/chat/completions"
+    os.environ["HUNTER_API_URL"] = f"{mock.url}/hunter/domain-search"
+    for key in ("PERPLEXITY_API_KEY", "OPENROUTER_API_KEY", "HUNTER_API_KEY"):
+        os.environ[key] = "benchmark"
+    if not args.real_rate_limits:
+        for provider in ("PERPLEXITY", "OPENROUTER", "HUNTER"):
+            os.environ[f"{provider}_REQUESTS_PER_MINUTE"] = "100000"
+    
+    import batch_research
+    import checkpoint
+    import streaming
+    import company_research
+    from artifact_store import configure_artifact_store
+    
+    with tempfile.TemporaryDirectory(prefix="pipeline_benchmark_") as tmp:
+        tmp = Path(tmp)
+        configure_artifact_store(tmp / "runs")
+        batch_research.PROGRESS_DIR = tmp / "batch"
+        checkpoint.CHECKPOINT_DIR = tmp / "checkpoints"
+        streaming.LIVE_OUTPUT_DIR = tmp / "live"
+        input_path = tmp / "companies.csv"
+        write_companies(input_path, args.companies)
+        
+        main_args = ["--batch", str(input_path), "--workers", str(args.workers), "--max-inflight",
+                     str(args.max_inflight), "--query-plan", args.query_plan, "--no-cache"]
+        if args.stream:
+            main_args.append("--stream")
+        if args.hedge_after is not None:
+            main_args += ["--hedge-after", str(args.hedge_after)]
+        
+        timer = StageTimer()
+        timer.wrap(company_research, STAGE_FUNCTIONS)
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            company_research.main(main_args)
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            timer.restore()
+            mock.stop()
+        reports = len(company_research.get_artifact_store().read_index())
+    
+    stages = summarize_stages(timer.durations)
+    results = {
+        "settings": vars(args),
+        "seconds": round(elapsed, 2),
+        "reports": reports,
+        "companies_per_minute": round(reports / elapsed * 60, 2) if elapsed else 0,
+        "peak_memory_mb": round(peak_bytes / 1024 / 1024, 2),
+        "requests": dict(mock.counts),
+        "stages": stages,
+    }
+    
+    print("\n" + "=" * 80)
+    print(f"{reports} of {args.companies} reports in {elapsed:.1f}s: {results['companies_per_minute']} companies/min, "
+          f"peak memory {results['peak_memory_mb']} MB")
+    print(f"Mock API requests: {mock.counts['chat']} chat, {mock.counts['hunter']} Hunter.io, "
+          f"{mock.counts['throttled']} answered with 429")
+    print(f"{'stage':<22}{'count':>7}{'p50 s':>10}{'p95 s':>10}{'max s':>10}")
+    for stage, stats in stages.items():
+        print(f"{stage:<22}{stats['count']:>7}{stats['p50']:>10}{stats['p95']:>10}{stats['max']:>10}")
+    
+    output_path = Path(args.output) if args.output else \
+        BENCHMARK_OUTPUT_DIR / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
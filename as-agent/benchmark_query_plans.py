@@ -0,0 +1,132 @@
+"""Benchmark the split and consolidated research query plans.
+
+Runs the research stage for each company with both plans and compares wall
+time, requests sent, tokens used and how many sections came back with
+content. The response cache is disabled so every run hits the API; this
+costs real API calls.
+
+Usage:
+    python benchmark_query_plans.py "Acme Corp" "Globex" --runs 2
+    python benchmark_query_plans.py --batch companies.csv --output results.json
+"""
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import company_research
+from response_cache import configure_cache
+from query_plans import QUERY_PLANS
+
+BENCHMARK_OUTPUT_DIR = Path(__file__).parent / "outputs" / "benchmarks"
+
+class UsageRecorder:
+    """Wraps a search function and totals requests and token usage across threads."""
+    
+    def __init__(self, search_fn):
+        self.search_fn = search_fn
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, *args, **kwargs):
+        result = self.search_fn(*args, **kwargs)
+        usage = (result or {}).get("usage") or {}
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+            self.completion_tokens += usage.get("completion_tokens", 0) or 0
+        return result
+
+def run_plan(plan, company_name, additional_info, search_fn):
+    """Run the research stage with one query plan and return its measurements."""
+    queries = company_research.generate_research_queries(company_name, additional_info)
+    recorder = UsageRecorder(search_fn)
+    
+    start = time.perf_counter()
+    if plan == "consolidated":
+        results = company_research.run_consolidated_research(queries, company_name, additional_info, recorder)
+    else:
+        results = company_research.run_research_queries(queries, company_name, recorder)
+    elapsed = time.perf_counter() - start
+    
+    section_lengths = [len(company_research.get_research_text(data)) for data in results if data]
+    return {
+        "plan": plan,
+        "company": company_name,
+        "seconds": round(elapsed, 2),
+        "requests": recorder.requests,
+        "prompt_tokens": recorder.prompt_tokens,
+        "completion_tokens": recorder.completion_tokens,
+        "sections_filled": len(section_lengths),
+        "sections_total": len(queries),
+        "avg_section_chars": round(sum(section_lengths) / len(section_lengths)) if section_lengths else 0,
+        "citations": sum(len(data.get("citations") or []) for data in results if isinstance(data, dict)),
+    }
+
+def summarize(rows):
+    """Return per-plan averages of the measurements."""
+    summary = {}
+    for plan in QUERY_PLANS:
+        plan_rows = [row for row in rows if row["plan"] == plan]
+        if not plan_rows:
+            continue
+        summary[plan] = {
+            key: round(sum(row[key] for row in plan_rows) / len(plan_rows), 2)
+            for key in ("seconds", "requests", "prompt_tokens", "completion_tokens",
+                        "sections_filled", "avg_section_chars", "citations")
+        }
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the split and consolidated research query plans.")
+    parser.add_argument("companies", nargs="*", help="Company names to research")
+    parser.add_argument("--batch", metavar="FILE", help="CSV or JSONL file of companies, as for company_research.py --batch")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per company and plan (default: 1)")
+    parser.add_argument("--output", help="Where to write the JSON results; defaults to outputs/benchmarks/")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    companies = [(name, "") for name in args.companies]
+    if args.batch:
+        from batch_research import load_batch_input
+        companies += [(row["company_name"], row["additional_info"]) for row in load_batch_input(args.batch)]
+    if not companies:
+        print("No companies given.")
+        return
+    
+    search_fn = company_research.select_search_fn()
+    if not search_fn:
+        print("Set PERPLEXITY_API_KEY or OPENROUTER_API_KEY to run the benchmark.")
+        return
+    configure_cache(enabled=False)
+    
+    rows = []
+    for company_name, additional_info in companies:
+        for run in range(args.runs):
+            # Alternate the order so neither plan always runs against a warmer connection pool
+            plans = QUERY_PLANS if run % 2 == 0 else tuple(reversed(QUERY_PLANS))
+            for plan in plans:
+                print(f"\n--- {company_name}: {plan} plan (run {run + 1}/{args.runs}) ---")
+                rows.append(run_plan(plan, company_name, additional_info, search_fn))
+    
+    summary = summarize(rows)
+    print("\n" + "=" * 80)
+    print(f"{'plan':<14}{'seconds':>9}{'requests':>10}{'prompt tok':>12}{'output tok':>12}{'sections':>10}{'chars/sec':>11}")
+    for plan, stats in summary.items():
+        print(f"{plan:<14}{stats['seconds']:>9}{stats['requests']:>10}{stats['prompt_tokens']:>12}"
+              f"{stats['completion_tokens']:>12}{stats['sections_filled']:>10}{stats['avg_section_chars']:>11}")
+    
+    output_path = Path(args.output) if args.output else \
+        BENCHMARK_OUTPUT_DIR / f"query_plans_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(output_path, 'w') as f:
+        json.dump({"runs": rows, "summary": summary}, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
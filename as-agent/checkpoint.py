@@ -0,0 +1,105 @@
+"""Checkpointed run state so an interrupted research run can be resumed.
+
+Each run writes its stage results (research sections, company facts,
+Hunter.io lookup, location restrictions and cover letter) to a state file
+as soon as they are available, rewriting it atomically so a crash never
+leaves a half-written file. The file is named after the company and a hash
+of the run's inputs, and is removed once the report has been saved. With
+--resume, a run with the same inputs loads it and skips the stages that
+already finished.
+"""
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+# Checkpoints live next to the other agent outputs
+CHECKPOINT_DIR = Path(__file__).parent / "outputs" / "checkpoints"
+CHECKPOINT_VERSION = 1
+
+def run_key(company_name, company_url="", additional_info="", interest_reason=None):
+    """Return a short hash identifying a run by its inputs."""
+    inputs = json.dumps([company_name, company_url or "", additional_info or "", interest_reason or ""])
+    return hashlib.sha1(inputs.encode("utf-8")).hexdigest()[:12]
+
+def checkpoint_path(company_name, key):
+    """Return the checkpoint file for a run."""
+    clean_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in company_name.strip())
+    return CHECKPOINT_DIR / f"{clean_name}_{key}.json"
+
+class RunCheckpoint:
+    """Stage results of one research run, saved to disk after every update."""
+    
+    def __init__(self, path, state=None):
+        self.path = Path(path)
+        self.state = state or {"version": CHECKPOINT_VERSION, "sections": {}, "stages": {}}
+        self._lock = threading.Lock()
+    
+    def __contains__(self, name):
+        return name in self.state["stages"]
+    
+    def get(self, name, default=None):
+        """Return a recorded stage value."""
+        return self.state["stages"].get(name, default)
+    
+    def section(self, query):
+        """Return the saved section for a query, or None if it has not finished."""
+        section = self.state["sections"].get(query["title"])
+        if section and section.get("query") == query["query"] and section.get("result"):
+            return section
+        return None
+    
+    def record_section(self, query, result, fetched_at):
+        """Record a finished research query and save."""
+        with self._lock:
+            self.state["sections"][query["title"]] = {
+                "query": query["query"],
+                "fetched_at": fetched_at,
+                "result": result,
+            }
+            self._save()
+    
+    def record(self, **stages):
+        """Record one or more finished stages and save."""
+        with self._lock:
+            self.state["stages"].update(stages)
+            self._save()
+    
+    def _save(self):
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        tmp_path.replace(self.path)
+    
+    def remove(self):
+        """Delete the checkpoint once the run has finished."""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+def load_checkpoint(path):
+    """Load a checkpoint's state, returning None if it is missing, unreadable or from another version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read checkpoint {path}: {e}")
+        return None
+    if state.get("version") != CHECKPOINT_VERSION:
+        return None
+    return state
+
+def open_checkpoint(company_name, company_url="", additional_info="", interest_reason=None, resume=False):
+    """Return the checkpoint for a run, loading the saved state when resuming."""
+    path = checkpoint_path(company_name, run_key(company_name, company_url, additional_info, interest_reason))
+    state = load_checkpoint(path) if resume else None
+    if state:
+        print(f"Resuming from checkpoint {path}: {len(state['sections'])} sections and "
+              f"{len(state['stages'])} other stages already done")
+    elif resume:
+        print("No checkpoint found for this run, starting from the beginning")
+    return RunCheckpoint(path, state)
@@ -3,11 +3,28 @@ import os
 import sys
 import json
 import time
-import requests
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-import re
+from response_cache import configure_cache, get_response_cache, make_cache_key
+from http_clients import http_get, http_post, set_max_inflight_requests, MAX_INFLIGHT_REQUESTS
+from streaming import LiveReportWriter, collect_stream
+from query_plans import QUERY_PLANS, SectionTokenRouter, build_consolidated_query, split_sections
+from structured_extraction import (fetch_company_facts, generate_facts_section, get_cover_letter_schema,
+                                   parse_json_response)
+from location_rules import get_rule_engine
+from gazetteer import get_gazetteer
+from timezones import check_time_zone_overlap, resolve_candidate_time_zone, resolve_time_zone_requirements
+from artifact_store import clean_company_name, get_artifact_store
+from checkpoint import open_checkpoint
+from pdf_worker import PDF_WORKERS, configure_pdf_workers, get_pdf_renderer
+from telemetry import current_trace, in_trace_context, run_trace, span, traced
+from provider_router import HEDGE_AFTER_SECONDS, ProviderRouter
+from incremental import (EMAILS_TTL_DAYS, FACTS_TTL_DAYS, build_section_state, find_latest_state, is_fresh,
+                         plan_refresh, previous_section)
 
 # Load environment variables
 load_dotenv()
@@ -17,20 +34,56 @@ HUNTER_API_KEY = os.getenv("HUNTER_API_KEY")
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+# API Endpoints
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+HUNTER_API_URL = os.getenv("HUNTER_API_URL", "https://api.hunter.io/v2/domain-search")
+
+# Models (the Sonar Pro model for research on Perplexity, Claude 3 Opus for deep research on OpenRouter)
+PERPLEXITY_MODEL = "sonar-pro"
+OPENROUTER_MODEL = "anthropic/claude-3-opus:beta"
+
 # Constants
 OUTPUT_DIR = Path(__file__).parent / "outputs"
 TEMPLATE_PATH = Path(__file__).parent.parent / "config-files" / "templates" / "as-md" / "remote-general.md"
 CANDIDATE_DATA_PATH = Path(__file__).parent.parent / "context-data" / "candidate" / "example.json"
-JSON_OUTPUT_DIR = Path(__file__).parent / "outputs" / "json"
+
+# Maximum number of research queries sent concurrently for a single company
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", "4"))
+
+# Stream research responses into a live report file as tokens arrive
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0").lower() in ("1", "true", "yes")
+
+# "split" sends one request per research section, "consolidated" asks for all of them at once
+RESEARCH_QUERY_PLAN = os.getenv("RESEARCH_QUERY_PLAN", "split")
+
+# Ask for website, HQ, size, remote policy and restrictions as schema-constrained JSON
+STRUCTURED_EXTRACTION = os.getenv("STRUCTURED_EXTRACTION", "1").lower() in ("1", "true", "yes")
+
+# Reuse fresh sections of the latest report instead of researching everything again
+INCREMENTAL_RESEARCH = os.getenv("INCREMENTAL_RESEARCH", "0").lower() in ("1", "true", "yes")
+
+# Pick up an interrupted run from its checkpoint instead of starting over
+RESUME_RUNS = os.getenv("RESUME_RUNS", "0").lower() in ("1", "true", "yes")
+
+# Hunter.io domain search is paged; paging stops early once enough useful contacts are found
+HUNTER_PAGE_SIZE = int(os.getenv("HUNTER_PAGE_SIZE", "20"))
+HUNTER_MAX_PAGES = int(os.getenv("HUNTER_MAX_PAGES", "5"))
+HUNTER_ENOUGH_CAREER_CONTACTS = int(os.getenv("HUNTER_ENOUGH_CAREER_CONTACTS", "3"))
+HUNTER_ENOUGH_FOUNDER_CONTACTS = int(os.getenv("HUNTER_ENOUGH_FOUNDER_CONTACTS", "1"))
+
+# Domain lookups in progress, so concurrent runs for the same domain share one set of requests
+_hunter_inflight = {}
+_hunter_inflight_lock = threading.Lock()
+
+# Finished domain lookups of this process, so a batch prefetch is reused even when the response cache is off
+_hunter_results = {}
 
 def setup():
     """Setup the environment and check for required API keys."""
     # Create outputs directory if it doesn't exist
     OUTPUT_DIR.mkdir(exist_ok=True)
     
-    # Create JSON outputs directory
-    JSON_OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
-    
     # Check for required API keys
     missing_keys = []
     if not HUNTER_API_KEY:
@@ -47,7 +100,7 @@ def setup():
     if not TEMPLATE_PATH.exists():
         print(f"Error: Template file not found at {TEMPLATE_PATH}")
         sys.exit(1)
-        
+    
     # Check if candidate data exists
     if not CANDIDATE_DATA_PATH.exists():
         print(f"Warning: Candidate data file not found at {CANDIDATE_DATA_PATH}")
@@ -65,10 +118,10 @@ def load_candidate_data():
         if not candidate_file.exists():
             print("Warning: Candidate data file not found")
             return None
-            
+        
         with open(candidate_file, 'r') as f:
             candidate_data = json.load(f)
-            
+        
         if candidate_data and isinstance(candidate_data, list) and len(candidate_data) > 0:
             return candidate_data[0]  # Return the first candidate object
         else:
@@ -78,8 +131,14 @@ def load_candidate_data():
         print(f"Error loading candidate data: {e}")
         return None
 
-def search_perplexity(query, company_name):
-    """Search using Perplexity API."""
+@traced("llm_request", provider="perplexity", model=PERPLEXITY_MODEL)
+def search_perplexity(query, company_name, on_token=None, json_schema=None):
+    """Search using Perplexity API.
+    
+    If on_token is given, the response is streamed and on_token is called
+    with each fragment of text as it arrives. If json_schema is given, the
+    response is constrained to JSON matching the schema.
+    """
     if not PERPLEXITY_API_KEY:
         print("Perplexity API key not found, skipping this search method.")
         return None
@@ -94,7 +153,7 @@ def search_perplexity(query, company_name):
     }
     
     data = {
-        "model": "sonar-pro",  # Using the Sonar Pro model for research
+        "model": PERPLEXITY_MODEL,
         "messages": [
             {
                 "role": "system",
@@ -107,29 +166,46 @@ def search_perplexity(query, company_name):
         ]
     }
     
+    if json_schema:
+        data["response_format"] = {"type": "json_schema", "json_schema": {"schema": json_schema}}
+    
+    cache = get_response_cache()
+    cache_key = make_cache_key("perplexity", data["model"], data["messages"],
+                               params={"response_format": data["response_format"]} if json_schema else None)
+    result = cache.get("perplexity", cache_key) if cache else None
+    
     try:
-        print("Waiting for Perplexity API response...")
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=data
-        )
-        
-        if response.status_code != 200:
-            print(f"Error: Perplexity API returned status code {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
+        if result is not None:
+            print("Using cached Perplexity response")
+            if on_token and result.get("choices"):
+                on_token(result["choices"][0]["message"]["content"])
+        else:
+            print("Waiting for Perplexity API response...")
+            response = http_post(
+                PERPLEXITY_API_URL,
+                provider="perplexity",
+                headers=headers,
+                json=dict(data, stream=True) if on_token else data,
+                stream=bool(on_token)
+            )
             
-        response.raise_for_status()
-        result = response.json()
-        
-        print("Received response from Perplexity API")
+            if response.status_code != 200:
+                print(f"Error: Perplexity API returned status code {response.status_code}")
+                print(f"Response: {response.text}")
+                return None
+            
+            response.raise_for_status()
+            result = collect_stream(response, on_token) if on_token else response.json()
+            
+            print("Received response from Perplexity API")
+            if cache:
+                cache.set("perplexity", cache_key, result)
         
         # Extract the text from the response
         if "choices" in result and len(result["choices"]) > 0:
             text = result["choices"][0]["message"]["content"]
             print(f"Successfully extracted content from Perplexity response (length: {len(text)} characters)")
-            return {"text": text, "citations": result.get("citations", [])}
+            return {"text": text, "citations": result.get("citations", []), "usage": result.get("usage")}
         else:
             print("Error: Could not extract content from Perplexity response")
             print(f"Response structure: {result.keys()}")
@@ -139,8 +215,14 @@ def search_perplexity(query, company_name):
         print("Check your API key and network connection")
         return None
 
-def search_openrouter(query, company_name):
-    """Search using OpenRouter API."""
+@traced("llm_request", provider="openrouter", model=OPENROUTER_MODEL)
+def search_openrouter(query, company_name, on_token=None, json_schema=None):
+    """Search using OpenRouter API.
+    
+    If on_token is given, the response is streamed and on_token is called
+    with each fragment of text as it arrives. If json_schema is given, the
+    response is constrained to JSON matching the schema.
+    """
     if not OPENROUTER_API_KEY:
         print("OpenRouter API key not found, skipping this search method.")
         return None
@@ -153,7 +235,7 @@ def search_openrouter(query, company_name):
     }
     
     data = {
-        "model": "anthropic/claude-3-opus:beta",  # Using Claude 3 Opus for deep research
+        "model": OPENROUTER_MODEL,
         "messages": [
             {
                 "role": "user",
@@ -162,47 +244,96 @@ def search_openrouter(query, company_name):
         ]
     }
     
+    if json_schema:
+        data["response_format"] = {"type": "json_schema", "json_schema": {"name": "structured_response", "schema": json_schema}}
+    
+    cache = get_response_cache()
+    cache_key = make_cache_key("openrouter", data["model"], data["messages"],
+                               params={"response_format": data["response_format"]} if json_schema else None)
+    cached = cache.get("openrouter", cache_key) if cache else None
+    if cached is not None:
+        print("Using cached OpenRouter response")
+        if on_token and cached.get("choices"):
+            on_token(cached["choices"][0]["message"]["content"])
+        return cached
+    
     try:
         print("Sending request to OpenRouter API...")
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+        response = http_post(
+            OPENROUTER_API_URL,
+            provider="openrouter",
             headers=headers,
-            json=data
+            json=dict(data, stream=True) if on_token else data,
+            stream=bool(on_token)
         )
         response.raise_for_status()
-        return response.json()
+        result = collect_stream(response, on_token) if on_token else response.json()
+        if cache:
+            cache.set("openrouter", cache_key, result)
+        return result
     except Exception as e:
         print(f"Error searching OpenRouter: {e}")
         return None
 
 def search_hunter_io(company_domain):
-    """Search for email addresses using Hunter.io API."""
+    """Search for email addresses using Hunter.io API.
+    
+    Results are cached per domain. If another thread is already looking up
+    the same domain, this waits for its result instead of sending the same
+    requests again, and a domain already looked up by this process (for
+    example by the batch prefetch) is not requested again.
+    """
     if not HUNTER_API_KEY:
         print("Hunter.io API key not found, skipping email lookup.")
         return None
     
+    company_domain = company_domain.lower()
+    with _hunter_inflight_lock:
+        if company_domain in _hunter_results:
+            print(f"Using the Hunter.io results for {company_domain} from earlier in this run")
+            return _hunter_results[company_domain]
+        future = _hunter_inflight.get(company_domain)
+        owner = future is None
+        if owner:
+            future = _hunter_inflight[company_domain] = Future()
+    if not owner:
+        print(f"Waiting for the Hunter.io lookup of {company_domain} already in progress...")
+        return future.result()
+    
+    try:
+        result = _search_hunter_io(company_domain)
+        if result is not None:
+            with _hunter_inflight_lock:
+                _hunter_results[company_domain] = result
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _hunter_inflight_lock:
+            _hunter_inflight.pop(company_domain, None)
+
+@traced("hunter_lookup", provider="hunter")
+def _search_hunter_io(company_domain):
+    """Fetch the pages of a Hunter.io domain search, using the per-domain cache."""
     print(f"Looking up email addresses for {company_domain} using Hunter.io...")
     
-    params = {
-        "domain": company_domain,
-        "api_key": HUNTER_API_KEY,
-        "limit": 20  # Increased limit to get more results for filtering
-    }
+    # The whole paged result is cached under the domain alone
+    cache = get_response_cache()
+    cache_key = make_cache_key("hunter", params={"domain": company_domain, "paged": True})
+    result = cache.get("hunter", cache_key) if cache else None
     
     try:
-        print("Sending request to Hunter.io API...")
-        response = requests.get(
-            "https://api.hunter.io/v2/domain-search",
-            params=params
-        )
-        
-        if response.status_code != 200:
-            print(f"Error: Hunter.io API returned status code {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
-            
-        response.raise_for_status()
-        result = response.json()
+        if result is not None:
+            print("Using cached Hunter.io response")
+        else:
+            result, complete = fetch_hunter_pages(company_domain)
+            if result is None:
+                return None
+            # A partial result is used for this run but not cached, so the next run fetches it all
+            if cache and complete:
+                cache.set("hunter", cache_key, result)
         
         if "data" in result and "emails" in result["data"]:
             email_count = len(result["data"]["emails"])
@@ -216,6 +347,66 @@ def search_hunter_io(company_domain):
         print("Check your API key and network connection")
         return None
 
+def fetch_hunter_pages(company_domain):
+    """Request domain search pages until the results run out or enough contacts are found.
+    
+    Returns (result, complete): the first page's response with the emails of
+    every page merged into it, and False if a later page failed. Errors on
+    the first page are raised.
+    """
+    result = None
+    emails = []
+    seen = set()
+    complete = True
+    for page in range(max(1, HUNTER_MAX_PAGES)):
+        params = {
+            "domain": company_domain,
+            "api_key": HUNTER_API_KEY,
+            "limit": HUNTER_PAGE_SIZE,
+            "offset": page * HUNTER_PAGE_SIZE,
+        }
+        print(f"Sending request to Hunter.io API (page {page + 1})...")
+        try:
+            response = http_get(HUNTER_API_URL, provider="hunter", params=params)
+            if response.status_code != 200:
+                print(f"Error: Hunter.io API returned status code {response.status_code}")
+                print(f"Response: {response.text}")
+                if result is None:
+                    return None, False
+                complete = False
+                break
+            page_result = response.json()
+        except Exception as e:
+            if result is None:
+                raise
+            # Keep the contacts of the pages already fetched
+            print(f"Error fetching Hunter.io page {page + 1}, using the {len(emails)} emails found so far: {e}")
+            complete = False
+            break
+        
+        page_emails = (page_result.get("data") or {}).get("emails") or []
+        if result is None:
+            result = page_result
+        for email in page_emails:
+            if email.get("value") not in seen:
+                seen.add(email.get("value"))
+                emails.append(email)
+        
+        career_emails, founder_emails, _, _ = filter_career_emails({"data": {"emails": emails}})
+        if (len(career_emails) >= HUNTER_ENOUGH_CAREER_CONTACTS
+                and len(founder_emails) >= HUNTER_ENOUGH_FOUNDER_CONTACTS):
+            print(f"Found {len(career_emails)} career and {len(founder_emails)} founder contacts, "
+                  "not fetching more pages")
+            break
+        
+        total = (page_result.get("meta") or {}).get("results")
+        if len(page_emails) < HUNTER_PAGE_SIZE or (total is not None and params["offset"] + len(page_emails) >= total):
+            break
+    
+    if result.get("data"):
+        result["data"]["emails"] = emails
+    return result, complete
+
 def extract_domain_from_website(website):
     """Extract domain from website URL and normalize it."""
     if not website:
@@ -227,7 +418,7 @@ def extract_domain_from_website(website):
         if not isinstance(website, str):
             print(f"Warning: Non-string website URL provided: {type(website)}")
             website = str(website)
-            
+        
         if not website.startswith(('http://', 'https://')):
             website = 'https://' + website
         
@@ -308,46 +499,150 @@ def filter_career_emails(emails_data):
     return career_emails, founder_emails, generic_emails, non_generic_emails
 
 def generate_research_queries(company_name, additional_info):
-    """Generate research queries for the company."""
+    """Generate research queries for the company.
+    
+    ttl_days is how long a section stays fresh for incremental re-research.
+    """
     queries = [
         {
             "title": "Company Overview",
+            "ttl_days": 30,
             "query": f"Detailed company information for {company_name} {additional_info if additional_info else ''} including size, headquarters, founding date, and description"
         },
         {
             "title": "Remote Work Policies",
+            "ttl_days": 14,
             "query": f"Remote work policies and culture at {company_name} {additional_info if additional_info else ''}, including location restrictions and time zone expectations"
         },
         {
             "title": "Leadership and Funding",
+            "ttl_days": 7,
             "query": f"Leadership team and funding history of {company_name} {additional_info if additional_info else ''}, including VCs and backers"
         },
         {
             "title": "Career Opportunities",
+            "ttl_days": 7,
             "query": f"Career opportunities and hiring process at {company_name} {additional_info if additional_info else ''}, including salary transparency and compensation strategy"
         },
         {
             "title": "Company Culture and Values",
+            "ttl_days": 30,
             "query": f"Company values, mission, and culture at {company_name} {additional_info if additional_info else ''}"
         },
         {
             "title": "Market Positioning",
+            "ttl_days": 30,
             "query": f"Market position and competitors of {company_name} {additional_info if additional_info else ''}, including industry trends and business model"
         },
         {
             "title": "Company Reputation",
+            "ttl_days": 14,
             "query": f"Any controversies or notable achievements related to {company_name} {additional_info if additional_info else ''}, including employee reviews and public perception"
         }
     ]
     return queries
 
-def extract_company_website(research_data):
-    """Extract company website from research data."""
-    # This is a simplified implementation - in a real scenario, you would parse the research data
-    # to find the company's website
+def run_research_queries(queries, company_name, search_fn, max_workers=RESEARCH_CONCURRENCY, live_writer=None,
+                         on_result=None, indices=None):
+    """Run research queries concurrently and return the results in query order.
+    
+    Failed queries leave None in their slot so results stay aligned with the
+    query titles that generate_report() maps them to. With a live_writer,
+    responses are streamed into the matching section of the live report.
+    on_result(index, result) is called as each query completes, so later
+    stages can start on early results. If indices is given, only those
+    queries are sent and the other slots stay None.
+    """
+    results = [None] * len(queries)
+    indices = range(len(queries)) if indices is None else indices
+    if not indices:
+        return results
+    
+    max_workers = max(1, min(max_workers, len(indices)))
+    print(f"Sending {len(indices)} queries with up to {max_workers} in flight...")
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i in indices:
+            query = queries[i]
+            if live_writer:
+                future = executor.submit(in_trace_context(search_fn), query["query"], company_name,
+                                         on_token=live_writer.section(i))
+            else:
+                future = executor.submit(in_trace_context(search_fn), query["query"], company_name)
+            futures[future] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error running query {i + 1}: {e}")
+                result = None
+            
+            if result:
+                results[i] = result
+                print(f"Successfully added research data from query {i + 1} ({queries[i]['title']})")
+            else:
+                print(f"No data retrieved for query {i + 1} ({queries[i]['title']})")
+            
+            if on_result:
+                on_result(i, result)
     
-    # For demonstration purposes, let's assume we can find it in the research data
-    # In a real implementation, you would use NLP or regex to extract this information
+    return results
+
+def run_consolidated_research(queries, company_name, additional_info, search_fn, live_writer=None, on_result=None,
+                              indices=None):
+    """Ask for every research section in a single request and split the answer per query.
+    
+    Returns results aligned with the queries, like run_research_queries().
+    Sections missing from the answer leave None in their slot. The sources
+    of the single answer are attached to the last section, so they are
+    listed once in the report with their original numbering. on_result is
+    called for each section once the answer has been split. If indices is
+    given, only those sections are requested.
+    """
+    results = [None] * len(queries)
+    indices = range(len(queries)) if indices is None else indices
+    if not indices:
+        return results
+    
+    titles = [query["title"] for query in queries]
+    prompt = build_consolidated_query(company_name, additional_info, [queries[i] for i in indices])
+    print(f"Sending 1 consolidated query covering {len(indices)} sections...")
+    
+    router = SectionTokenRouter(live_writer, titles) if live_writer else None
+    try:
+        if router:
+            result = search_fn(prompt, company_name, on_token=router)
+            router.flush()
+        else:
+            result = search_fn(prompt, company_name)
+    except Exception as e:
+        print(f"Error running consolidated query: {e}")
+        return results
+    
+    sections = split_sections(get_research_text(result), titles)
+    for i in indices:
+        section = sections[i]
+        if section:
+            results[i] = {"text": section, "citations": []}
+            print(f"Successfully added research data for section {i + 1} ({titles[i]})")
+        else:
+            print(f"No data retrieved for section {i + 1} ({titles[i]})")
+    
+    answered = [data for data in results if data]
+    if answered and isinstance(result, dict):
+        answered[-1]["citations"] = result.get("citations", [])
+    
+    if on_result:
+        for i in indices:
+            on_result(i, results[i])
+    return results
+
+def extract_company_website(research_data, company_facts=None):
+    """Extract company website from the structured company facts."""
+    if company_facts and company_facts.get("website"):
+        return company_facts["website"]
     
     # If website can't be found, return None
     return None
@@ -364,13 +659,27 @@ def is_remote_friendly(research_data):
     # In a real implementation, you would return True or False based on the analysis
     return True
 
+def get_research_text(data):
+    """Return the text of a research result from either API format."""
+    if not isinstance(data, dict):
+        return ""
+    if "text" in data and data["text"]:  # Perplexity API format
+        return data["text"] if isinstance(data["text"], str) else str(data["text"])
+    if "choices" in data and data["choices"]:  # OpenRouter API format
+        content = data["choices"][0].get("message", {}).get("content")
+        if content:
+            return content if isinstance(content, str) else str(content)
+    return ""
+
+@traced("location_extraction")
 def extract_location_restrictions(research_data):
     """Extract location restrictions from research data.
     Returns a dictionary with location restriction details.
-    """
-    # In a real implementation, you would parse the research data to extract location restrictions
-    # This is a simplified implementation for demonstration purposes
     
+    Each research text is scanned once by the rule engine in location_rules.py.
+    The individual matches (rule, matched text, offsets and the index of the
+    research item they came from) are kept under "matches".
+    """
     # Default values
     restrictions = {
         "has_restrictions": False,
@@ -378,94 +687,112 @@ def extract_location_restrictions(research_data):
         "excluded_regions": [],
         "time_zone_requirements": "",
         "restriction_level": "none",  # none, low, medium, high
-        "restriction_description": "No location restrictions found."
+        "restriction_description": "No location restrictions found.",
+        "matches": []
     }
     
-    # Parse research data to find location restrictions
-    # This would involve analyzing the text for mentions of location requirements
-    
     if not research_data:
         print("Warning: No research data provided for location restriction extraction")
         return restrictions
     
-    # Example logic (in a real implementation, this would be more sophisticated)
-    for data in research_data:
-        if not isinstance(data, dict):
-            continue
-            
-        text = ""
+    try:
+        engine = get_rule_engine()
+    except Exception as e:
+        print(f"Error loading location restriction rules: {e}")
+        return restrictions
+    
+    time_zones = []
+    for index, data in enumerate(research_data):
         try:
-            if "text" in data and data["text"]:  # Perplexity API format
-                text = data["text"].lower() if isinstance(data["text"], str) else str(data["text"]).lower()
-            elif "choices" in data and data["choices"] and len(data["choices"]) > 0:  # OpenRouter API format
-                content = data["choices"][0].get("message", {}).get("content")
-                if content:
-                    text = content.lower() if isinstance(content, str) else str(content).lower()
-            else:
+            text = get_research_text(data)
+            if not text:
                 continue
-                
-            # Check for common restriction phrases
-            if "us only" in text or "united states only" in text:
-                restrictions["has_restrictions"] = True
-                if "United States" not in restrictions["restricted_to"]:
-                    restrictions["restricted_to"].append("United States")
-                restrictions["restriction_level"] = "high"
             
-            if "eu only" in text or "europe only" in text:
+            for match in engine.scan(text, document=index):
+                restrictions["matches"].append(match)
                 restrictions["has_restrictions"] = True
-                if "European Union" not in restrictions["restricted_to"]:
-                    restrictions["restricted_to"].append("European Union")
-                restrictions["restriction_level"] = "high"
                 
-            if "north america" in text and "only" in text:
-                restrictions["has_restrictions"] = True
-                if "North America" not in restrictions["restricted_to"]:
-                    restrictions["restricted_to"].append("North America")
-                restrictions["restriction_level"] = "high"
+                if match["kind"] == "time_zone":
+                    if match["value"] not in time_zones:
+                        time_zones.append(match["value"])
+                elif match["value"] not in restrictions[match["kind"]]:
+                    restrictions[match["kind"]].append(match["value"])
                 
-            # Check for time zone requirements
-            if "time zone" in text and ("overlap" in text or "hours" in text):
-                # Extract time zone information (simplified)
-                if "est" in text or "edt" in text:
-                    restrictions["time_zone_requirements"] = "Eastern Time (ET)"
-                    restrictions["has_restrictions"] = True
-                    restrictions["restriction_level"] = max(restrictions["restriction_level"], "medium")
-                elif "pst" in text or "pdt" in text:
-                    restrictions["time_zone_requirements"] = "Pacific Time (PT)"
-                    restrictions["has_restrictions"] = True
-                    restrictions["restriction_level"] = max(restrictions["restriction_level"], "medium")
-                elif "cet" in text or "central european" in text:
-                    restrictions["time_zone_requirements"] = "Central European Time (CET)"
-                    restrictions["has_restrictions"] = True
-                    restrictions["restriction_level"] = max(restrictions["restriction_level"], "medium")
+                # Severity levels are compared by rank, not alphabetically
+                if engine.severity(match["severity"]) > engine.severity(restrictions["restriction_level"]):
+                    restrictions["restriction_level"] = match["severity"]
         except Exception as e:
             print(f"Error processing research data for location restrictions: {e}")
             continue
     
-    # Update restriction description based on findings
+    restrictions["time_zone_requirements"] = ", ".join(time_zones)
+    describe_location_restrictions(restrictions)
+    
+    return restrictions
+
+def describe_location_restrictions(restrictions):
+    """Update the restriction description based on the findings."""
     if restrictions["has_restrictions"]:
         description_parts = []
         
         if restrictions["restricted_to"]:
             description_parts.append(f"Restricted to: {', '.join(restrictions['restricted_to'])}")
-            
+        
         if restrictions["excluded_regions"]:
             description_parts.append(f"Excluded regions: {', '.join(restrictions['excluded_regions'])}")
-            
+        
         if restrictions["time_zone_requirements"]:
             description_parts.append(f"Time zone requirements: {restrictions['time_zone_requirements']}")
-            
+        
         restrictions["restriction_description"] = " | ".join(description_parts)
-    
     return restrictions
 
+def merge_location_facts(restrictions, company_facts):
+    """Merge the restrictions reported by the structured facts request into the rule-based ones.
+    
+    Regions are deduplicated by the countries they cover, so "US" from the
+    facts does not repeat "United States" found by the rules.
+    """
+    if not company_facts:
+        return restrictions
+    
+    gazetteer = get_gazetteer()
+    for kind, severity in (("restricted_to", "high"), ("excluded_regions", "medium")):
+        known = [gazetteer.resolve_region(region) for region in restrictions[kind]]
+        for region in company_facts.get(kind, []):
+            region = region.strip()
+            codes = gazetteer.resolve_region(region)
+            if not region or (codes is not None and codes in known) or region in restrictions[kind]:
+                continue
+            restrictions[kind].append(region)
+            known.append(codes)
+            restrictions["has_restrictions"] = True
+            if get_rule_engine().severity(severity) > get_rule_engine().severity(restrictions["restriction_level"]):
+                restrictions["restriction_level"] = severity
+    
+    time_zones = [zone.strip() for zone in restrictions["time_zone_requirements"].split(",") if zone.strip()]
+    known_zones = [tuple(resolve_time_zone_requirements(zone)) for zone in time_zones]
+    for zone in company_facts.get("time_zone_requirements", []):
+        zone = zone.strip()
+        resolved = tuple(resolve_time_zone_requirements(zone))
+        if not zone or zone in time_zones or (resolved and resolved in known_zones):
+            continue
+        time_zones.append(zone)
+        known_zones.append(resolved)
+        restrictions["has_restrictions"] = True
+        if get_rule_engine().severity("medium") > get_rule_engine().severity(restrictions["restriction_level"]):
+            restrictions["restriction_level"] = "medium"
+    restrictions["time_zone_requirements"] = ", ".join(time_zones)
+    
+    return describe_location_restrictions(restrictions)
+
 def check_location_compatibility(location_restrictions, candidate_data):
     """Check if candidate's location is compatible with company restrictions.
     Returns a tuple of (is_compatible, warning_message).
     """
     if not location_restrictions["has_restrictions"] or not candidate_data:
         return True, ""
-        
+    
     # Extract candidate location information
     candidate_location = candidate_data.get("personal_information", {}).get("location", "")
     candidate_timezone = candidate_data.get("personal_information", {}).get("timezone", "")
@@ -477,30 +804,38 @@ def check_location_compatibility(location_restrictions, candidate_data):
     is_compatible = True
     warning_reasons = []
     
+    # Resolve the candidate's location to country codes once and test each region by set membership
+    gazetteer = get_gazetteer()
+    candidate_codes = gazetteer.resolve_location(candidate_location)
+    if not candidate_codes:
+        # Cities missing from the gazetteer can still be placed through their time zone
+        zone_country = gazetteer.country_for_zone(resolve_candidate_time_zone(candidate_timezone, candidate_location))
+        candidate_codes = frozenset([zone_country]) if zone_country else candidate_codes
+    
+    def in_region(region):
+        return gazetteer.in_region(region, candidate_codes, candidate_location)
+    
     if location_restrictions["restricted_to"]:
-        # Simple region check (in a real implementation, this would be more sophisticated)
-        is_region_match = False
-        for region in location_restrictions["restricted_to"]:
-            if region.lower() in candidate_location.lower():
-                is_region_match = True
-                break
-                
+        is_region_match = any(in_region(region) for region in location_restrictions["restricted_to"])
+        
         if not is_region_match:
             is_compatible = False
             warning_reasons.append(f"Company is restricted to {', '.join(location_restrictions['restricted_to'])}, but candidate is in {candidate_location}")
     
     if location_restrictions["excluded_regions"]:
         for region in location_restrictions["excluded_regions"]:
-            if region.lower() in candidate_location.lower():
+            if in_region(region):
                 is_compatible = False
                 warning_reasons.append(f"Company excludes {region}, but candidate is in {candidate_location}")
     
-    # Check time zone compatibility (simplified)
-    if location_restrictions["time_zone_requirements"] and candidate_timezone:
-        # This is a very simplified check - in reality, you'd need more sophisticated time zone comparison
-        if location_restrictions["time_zone_requirements"].lower() not in candidate_timezone.lower():
+    # Check working-hour overlap between the company's and the candidate's time zones
+    if location_restrictions["time_zone_requirements"]:
+        tz_compatible, overlap_hours, tz_message = check_time_zone_overlap(
+            location_restrictions["time_zone_requirements"], candidate_timezone, candidate_location
+        )
+        if not tz_compatible:
             is_compatible = False
-            warning_reasons.append(f"Company requires {location_restrictions['time_zone_requirements']} overlap, but candidate is in {candidate_timezone}")
+            warning_reasons.append(f"Company requires {location_restrictions['time_zone_requirements']} overlap: {tz_message}")
     
     warning_message = ""
     if not is_compatible:
@@ -508,14 +843,15 @@ def check_location_compatibility(location_restrictions, candidate_data):
     
     return is_compatible, warning_message
 
-def generate_cover_letter(company_name, interest_reason, research_data):
+@traced("cover_letter")
+def generate_cover_letter(company_name, interest_reason, research_data, company_facts=None):
     """Generate a cover letter for the candidate."""
     # Load candidate data
     candidate_data = load_candidate_data()
     if not candidate_data:
         print("Warning: Could not load candidate data for cover letter")
         # Fallback to generic cover letter
-        return generate_generic_cover_letter(company_name, interest_reason, research_data)
+        return generate_generic_cover_letter(company_name, interest_reason, research_data, company_facts)
     
     # Extract candidate information
     name = candidate_data.get("personal_information", {}).get("name", "")
@@ -531,7 +867,7 @@ def generate_cover_letter(company_name, interest_reason, research_data):
     soft_skills = candidate_data.get("skills_and_expertise", {}).get("soft_skills", [])
     
     # Extract a brief company description from research data
-    company_description = extract_company_description(company_name, research_data)
+    company_description = extract_company_description(company_name, research_data, company_facts)
     
     # Generate cover letter using OpenRouter or Perplexity
     prompt = f"""
@@ -553,42 +889,17 @@ def generate_cover_letter(company_name, interest_reason, research_data):
     - Soft skills: {', '.join(soft_skills[:3])}
     
     The cover letter should be professional, personalized to the company, and highlight relevant experience and skills.
-    It MUST be between 100-120 words total and include a proper email signature with the candidate's actual name, website, and resume link.
+    It MUST be between 100-120 words total. Do not include a sign-off or signature; the candidate's name, website, and resume link are added after it.
     Make it concise, impactful, and focused on the most relevant skills and experiences.
-    """
     
-    # Generate using available API
-    cover_letter_text = ""
-    if OPENROUTER_API_KEY:
-        result = search_openrouter(prompt, company_name)
-        if result and "choices" in result and len(result["choices"]) > 0:
-            cover_letter_text = result["choices"][0]["message"]["content"]
-    elif PERPLEXITY_API_KEY:
-        result = search_perplexity(prompt, company_name)
-        if result and "text" in result:
-            cover_letter_text = result["text"]
-    
-    # Generate subject lines
-    subject_lines_prompt = f"""
-    Generate three concise, attention-grabbing email subject lines for {name}'s job application to {company_name}.
-    The subject lines should be professional but stand out in a recruiter's inbox.
-    Each should be no more than 8 words.
-    Format as a numbered list with just the subject lines, nothing else.
+    Also write three concise, attention-grabbing email subject lines for {name}'s application to {company_name}.
+    They should be professional but stand out in a recruiter's inbox, and each should be no more than 8 words.
+    
+    Respond with a JSON object with "cover_letter" and "subject_lines" fields.
     """
     
-    subject_lines = []
-    if OPENROUTER_API_KEY:
-        result = search_openrouter(subject_lines_prompt, company_name)
-        if result and "choices" in result and len(result["choices"]) > 0:
-            subject_lines_text = result["choices"][0]["message"]["content"]
-            subject_lines = [line.strip().replace("1. ", "").replace("2. ", "").replace("3. ", "") 
-                            for line in subject_lines_text.split("\n") if line.strip()][:3]
-    elif PERPLEXITY_API_KEY:
-        result = search_perplexity(subject_lines_prompt, company_name)
-        if result and "text" in result:
-            subject_lines_text = result["text"]
-            subject_lines = [line.strip().replace("1. ", "").replace("2. ", "").replace("3. ", "") 
-                            for line in subject_lines_text.split("\n") if line.strip()][:3]
+    # The letter and the subject lines come back from a single request
+    cover_letter_text, subject_lines = generate_application_text(prompt, company_name)
     
     # Format the cover letter section
     cover_letter_section = f"""
@@ -612,10 +923,32 @@ Best regards,
     
     return cover_letter_section
 
-def generate_generic_cover_letter(company_name, interest_reason, research_data):
+def generate_application_text(prompt, company_name):
+    """Generate a cover letter and subject lines with one schema-constrained request.
+    
+    Returns (cover_letter_text, subject_lines). If the response is not valid
+    JSON, the whole response is used as the letter, with no subject lines.
+    """
+    schema = get_cover_letter_schema()
+    text = ""
+    if OPENROUTER_API_KEY:
+        text = get_research_text(search_openrouter(prompt, company_name, json_schema=schema))
+    elif PERPLEXITY_API_KEY:
+        text = get_research_text(search_perplexity(prompt, company_name, json_schema=schema))
+    
+    payload = parse_json_response(text)
+    if payload is None:
+        return text.strip(), []
+    
+    cover_letter_text = payload.get("cover_letter") if isinstance(payload.get("cover_letter"), str) else ""
+    subject_lines = payload.get("subject_lines") if isinstance(payload.get("subject_lines"), list) else []
+    subject_lines = [line.strip() for line in subject_lines if isinstance(line, str) and line.strip()][:3]
+    return cover_letter_text.strip(), subject_lines
+
+def generate_generic_cover_letter(company_name, interest_reason, research_data, company_facts=None):
     """Generate a generic cover letter when candidate data is not available."""
     # Extract a brief company description from research data
-    company_description = extract_company_description(company_name, research_data)
+    company_description = extract_company_description(company_name, research_data, company_facts)
     
     # Generate cover letter using OpenRouter or Perplexity
     prompt = f"""
@@ -628,20 +961,13 @@ def generate_generic_cover_letter(company_name, interest_reason, research_data):
     Why the candidate is interested: {interest_reason}
     
     The cover letter should be professional, personalized to the company, and highlight relevant experience and skills.
-    It MUST be between 100-120 words total and include a proper email signature with name, website, and resume link.
+    It MUST be between 100-120 words total. Do not include a sign-off or signature; placeholders for them are added after it.
     Make it concise, impactful, and focused on the most relevant skills and experiences.
+    
+    Respond with a JSON object with a "cover_letter" field and an empty "subject_lines" list.
     """
     
-    # Generate using available API
-    cover_letter_text = ""
-    if OPENROUTER_API_KEY:
-        result = search_openrouter(prompt, company_name)
-        if result and "choices" in result and len(result["choices"]) > 0:
-            cover_letter_text = result["choices"][0]["message"]["content"]
-    elif PERPLEXITY_API_KEY:
-        result = search_perplexity(prompt, company_name)
-        if result and "text" in result:
-            cover_letter_text = result["text"]
+    cover_letter_text, _ = generate_application_text(prompt, company_name)
     
     # Format the cover letter section
     cover_letter_section = f"""
@@ -659,10 +985,11 @@ Best regards,
     
     return cover_letter_section
 
-def extract_company_description(company_name, research_data):
+def extract_company_description(company_name, research_data, company_facts=None):
     """Extract a brief company description from research data."""
-    # This is a simplified implementation
-    # In a real implementation, you would use NLP to extract relevant information
+    # The structured facts request asks for exactly this
+    if company_facts and company_facts.get("description"):
+        return company_facts["description"]
     
     company_description = f"{company_name} is a company that appears to be remote-friendly."
     
@@ -685,8 +1012,18 @@ def extract_company_description(company_name, research_data):
     
     return company_description
 
-def generate_report(company_name, company_url, additional_info, research_data, email_data, interest_reason=None):
-    """Generate the final research report."""
+@traced("report")
+def generate_report(company_name, company_url, additional_info, research_data, email_data, interest_reason=None,
+                    company_facts=None, cover_letter_section=None, location_restrictions=None):
+    """Generate the final research report.
+    
+    company_facts is the validated result of the structured facts request,
+    if it was made; it adds a "Company Facts" section and its restrictions
+    are merged with those found in the research text. cover_letter_section
+    is a cover letter generated earlier in the run; if it is missing and an
+    interest reason was given, one is generated here. location_restrictions
+    are extracted from the research data unless already given.
+    """
     # Process research data to extract key information
     # In a real implementation, you would use NLP to summarize and extract insights
     
@@ -699,7 +1036,11 @@ def generate_report(company_name, company_url, additional_info, research_data, e
         company_info += f"**Company URL:** {company_url}\n\n"
     
     # Extract location restrictions
-    location_restrictions = extract_location_restrictions(research_data)
+    if location_restrictions is None:
+        location_restrictions = extract_location_restrictions(research_data)
+        merge_location_facts(location_restrictions, company_facts)
+    
+    facts_section = generate_facts_section(company_facts)
     
     # Add location compatibility information
     location_section = generate_location_section(location_restrictions)
@@ -715,7 +1056,11 @@ def generate_report(company_name, company_url, additional_info, research_data, e
             section_title = queries[i-1]['title']
         else:
             section_title = f"Research Item {i}"
-            
+        
+        # Skip queries that returned nothing, keeping the remaining titles aligned
+        if data is None:
+            continue
+        
         research_section += f"### {section_title}\n\n"
         
         if isinstance(data, dict):
@@ -786,41 +1131,19 @@ def generate_report(company_name, company_url, additional_info, research_data, e
                     contact_section += f"- {email.get('value')}\n"
             contact_section += "\n"
     
-    # Generate a cover letter if interest reason is provided
-    cover_letter_section = ""
-    if interest_reason:
-        cover_letter_section = generate_cover_letter(company_name, interest_reason, research_data)
+    # Generate a cover letter if interest reason is provided and none was generated during research
+    if interest_reason and not cover_letter_section:
+        cover_letter_section = generate_cover_letter(company_name, interest_reason, research_data, company_facts)
     
     # Combine all sections into the final report
-    report = company_info + location_section + contact_section + research_section
+    report = company_info + facts_section + location_section + contact_section + research_section
     
     # Add the cover letter if available
     if cover_letter_section:
         report += "\n" + cover_letter_section
     
-    # Save location restrictions as JSON
-    save_location_restrictions_json(company_name, location_restrictions, company_url)
-    
     return report
 
-def save_location_restrictions_json(company_name, location_restrictions, company_url=None):
-    """Save location restrictions as JSON for later use."""
-    # Sanitize company name for filename
-    safe_name = "".join(c if c.isalnum() or c in [' ', '-', '_'] else '_' for c in company_name)
-    safe_name = safe_name.replace(' ', '_')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_name}_{timestamp}_location.json"
-    
-    output_path = JSON_OUTPUT_DIR / filename
-    
-    if company_url:
-        location_restrictions["company_url"] = company_url
-    
-    with open(output_path, 'w') as f:
-        json.dump(location_restrictions, f, indent=2)
-    
-    print(f"Location restrictions saved to {output_path}")
-
 def generate_location_section(location_restrictions):
     """Generate the location section of the report."""
     location_section = "## Location Restrictions\n\n"
@@ -831,58 +1154,37 @@ def generate_location_section(location_restrictions):
     
     return location_section
 
-def save_report(company_name, report, location_data=None):
-    """Save the report to a file."""
-    # Generate timestamp for filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # Clean company name for filename
-    clean_name = re.sub(r'[^\w\s-]', '', company_name).strip().replace(' ', '_')
-    
-    # Create company-specific subfolder within outputs directory
-    company_folder = os.path.join("outputs", clean_name)
-    os.makedirs(company_folder, exist_ok=True)
+@traced("save")
+def save_report(company_name, report, location_data=None, section_state=None):
+    """Save the report and its sidecars as a new run in the artifact store.
     
-    # Create date-based subfolder within company folder
-    date_folder = os.path.join(company_folder, datetime.now().strftime("%Y%m%d"))
-    os.makedirs(date_folder, exist_ok=True)
-    
-    # Create JSON output directory if it doesn't exist
-    json_output_dir = os.path.join(date_folder, "json")
-    os.makedirs(json_output_dir, exist_ok=True)
-    
-    # Create filename
-    filename = f"{clean_name}_{timestamp}.md"
-    filepath = os.path.join(date_folder, filename)
+    Returns the path of the Markdown report.
+    """
+    run = get_artifact_store().create_run(company_name)
+    print(f"Saving run {run.run_id} to {run.path}")
     
     # Save the markdown report
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(report)
-    
-    # Generate PDF from markdown
-    try:
-        from markdown_pdf import MarkdownPdf
-        
-        pdf_filename = f"{clean_name}_{timestamp}.pdf"
-        pdf_filepath = os.path.join(date_folder, pdf_filename)
-        
-        # Convert markdown to PDF
-        print(f"Generating PDF report: {pdf_filepath}")
-        md_pdf = MarkdownPdf()
-        md_pdf.convert_markdown_to_pdf(filepath, pdf_filepath)
-        print(f"PDF report generated successfully")
-    except Exception as e:
-        print(f"Error generating PDF: {e}")
-        print("PDF generation skipped. Please install required dependencies with: pip install markdown-pdf")
+    filepath = run.write_text(f"{run.run_id}.md", report, kind="report")
     
     # Save location data as JSON if provided
     if location_data:
-        json_filename = f"{clean_name}_{timestamp}_location.json"
-        json_filepath = os.path.join(json_output_dir, json_filename)
-        
-        with open(json_filepath, "w", encoding="utf-8") as f:
-            json.dump(location_data, f, indent=2)
+        run.write_json("location.json", location_data, kind="location")
+        run.update(has_restrictions=bool(location_data.get("has_restrictions")),
+                   restriction_level=location_data.get("restriction_level"))
     
+    # The section state keeps the raw responses each section was built from
+    if section_state:
+        run.write_json("sections.json", section_state, kind="sections")
+    
+    # Rendered inline, or queued on the PDF worker pool so the run can finish now
+    get_pdf_renderer().submit(run, filepath)
+    
+    # Spans recorded from here on, including a PDF rendered in the background, are added to the run's file
+    trace = current_trace()
+    if trace:
+        trace.attach(run)
+    
+    run.finish()
     return filepath
 
 def print_welcome():
@@ -931,17 +1233,30 @@ def get_user_input():
     
     return company_name, company_url, additional_info, interest_reason
 
-def main():
-    """Main function to run the company research agent."""
-    # Print welcome message
-    print_welcome()
-    
-    # Setup environment
-    setup()
+def select_search_fn():
+    """Return the search function for research.
     
-    # Get user input
-    company_name, company_url, additional_info, interest_reason = get_user_input()
+    With both API keys, queries are routed across Perplexity and OpenRouter
+    with failover and hedging (see provider_router.py). With one key, that
+    provider is used directly.
+    """
+    providers = []
+    if PERPLEXITY_API_KEY:
+        providers.append(("perplexity", search_perplexity))
+    if OPENROUTER_API_KEY:
+        providers.append(("openrouter", search_openrouter))
+    if not providers:
+        return None
+    if len(providers) == 1:
+        print(f"\nUsing {'Perplexity' if PERPLEXITY_API_KEY else 'OpenRouter'} API for research...")
+        return providers[0][1]
     
+    router = ProviderRouter(providers, hedge_after=HEDGE_AFTER_SECONDS)
+    print(f"\nRouting research across Perplexity and OpenRouter, starting with {router.ranked()[0][0]}...")
+    return router
+
+def research_company(company_name, company_url="", additional_info="", interest_reason=None):
+    """Run the full research pipeline for one company and return the report path."""
     print(f"\nStarting research on {company_name}...")
     if additional_info:
         print(f"Additional information provided: {additional_info}")
@@ -953,67 +1268,169 @@ def main():
     queries = generate_research_queries(company_name, additional_info)
     print(f"Generated {len(queries)} research queries")
     
-    # Collect research data
-    research_data = []
+    # Collect research data, trying Perplexity first and falling back to OpenRouter
+    search_fn = select_search_fn()
     
-    # Try Perplexity first, fall back to OpenRouter if needed
-    if PERPLEXITY_API_KEY:
-        print("\nUsing Perplexity API for research...")
-        for i, query in enumerate(queries, 1):
-            print(f"\nProcessing query {i} of {len(queries)}...")
-            result = search_perplexity(query["query"], company_name)
-            if result:
-                research_data.append(result)
-                print(f"Successfully added research data from query {i}")
-            else:
-                print(f"No data retrieved for query {i}")
-            
-            if i < len(queries):
-                print("Waiting before next query to avoid rate limiting...")
-                time.sleep(1)  # Avoid rate limiting
-    elif OPENROUTER_API_KEY:
-        print("\nUsing OpenRouter API for research...")
-        for i, query in enumerate(queries, 1):
-            print(f"\nProcessing query {i} of {len(queries)}...")
-            result = search_openrouter(query["query"], company_name)
-            if result:
-                research_data.append(result)
-                print(f"Successfully added research data from query {i}")
-            else:
-                print(f"No data retrieved for query {i}")
-            
-            if i < len(queries):
-                print("Waiting before next query to avoid rate limiting...")
-                time.sleep(1)  # Avoid rate limiting
+    previous_state = None
+    if INCREMENTAL_RESEARCH:
+        previous_state = find_latest_state(company_name)
+        if previous_state is None:
+            print("No previous report state found, researching every section")
+    checkpoint = open_checkpoint(company_name, company_url, additional_info, interest_reason, resume=RESUME_RUNS)
     
-    print(f"\nResearch complete. Collected data from {len(research_data)} queries")
+    live_writer = None
+    if STREAM_RESPONSES:
+        live_filename = f"{clean_company_name(company_name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+        live_writer = LiveReportWriter(company_name, [query["title"] for query in queries], live_filename)
+        print(f"Streaming live report to {live_writer.path}")
     
-    # Extract company website from research data if not provided by user
+    try:
+        with run_trace(company_name):
+            return _research_company(company_name, company_url, additional_info, interest_reason,
+                                     queries, search_fn, live_writer, checkpoint, previous_state)
+    except BaseException as e:
+        if live_writer:
+            live_writer.fail(e)
+        raise
+
+def _research_company(company_name, company_url, additional_info, interest_reason, queries, search_fn, live_writer,
+                      checkpoint, previous_state=None):
+    """Run the research, email lookup and report stages for research_company().
+    
+    Every finished stage is recorded in checkpoint, and stages it already
+    holds are not run again. With previous_state (the section state of an
+    earlier report), only the stale queries are sent and the fresh
+    sections, facts, emails and cover letter are reused.
+    """
+    now = time.time()
+    if previous_state:
+        reused, stale = plan_refresh(previous_state, queries, now)
+        print(f"\nReusing {len(reused)} fresh sections from the previous report, refreshing {len(stale)}")
+    else:
+        reused, stale = {}, list(range(len(queries)))
+    previous_state = previous_state or {}
+    
+    # Sections that finished before an interruption are not requested again
+    resumed = {i: checkpoint.section(queries[i]) for i in stale if checkpoint.section(queries[i])}
+    if resumed:
+        stale = [i for i in stale if i not in resumed]
+        print(f"Resuming {len(resumed)} sections from the checkpoint, {len(stale)} left to research")
+    kept = {**reused, **resumed}
+    
+    research_data = [kept[i]["result"] if i in kept else None for i in range(len(queries))]
+    fetched_at = [kept[i]["fetched_at"] if i in kept else None for i in range(len(queries))]
+    if live_writer:
+        for i in kept:
+            live_writer.append(i, get_research_text(research_data[i]))
+    
+    company_facts = None
+    facts_fetched_at = None
+    if "company_facts" in checkpoint:
+        company_facts = checkpoint.get("company_facts")
+        facts_fetched_at = checkpoint.get("facts_fetched_at")
+    elif is_fresh(previous_state.get("facts_fetched_at"), FACTS_TTL_DAYS, now):
+        company_facts = previous_state.get("company_facts")
+        facts_fetched_at = previous_state["facts_fetched_at"]
+    
+    # The cover letter is kept only if it was written for the same reason from an overview that is kept
+    cover_letter_section = None
+    if interest_reason and 0 in reused and previous_state.get("interest_reason") == interest_reason:
+        cover_letter_section = previous_state.get("cover_letter_section")
+    if "cover_letter_section" in checkpoint:
+        cover_letter_section = checkpoint.get("cover_letter_section")
+    
+    if search_fn:
+        # The structured facts request and the cover letter run alongside the research queries
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Both are checkpointed as soon as they finish, so an interrupted run does not request them again
+            def fetch_facts():
+                facts = fetch_company_facts(company_name, additional_info, search_fn, get_research_text)
+                if facts:
+                    checkpoint.record(company_facts=facts, facts_fetched_at=time.time())
+                return facts
+            
+            def write_cover_letter(overview):
+                section = generate_cover_letter(company_name, interest_reason, [overview])
+                if section:
+                    checkpoint.record(cover_letter_section=section)
+                return section
+            
+            facts_future = None
+            cover_letter_future = None
+            if STRUCTURED_EXTRACTION and facts_fetched_at is None:
+                facts_future = executor.submit(in_trace_context(fetch_facts))
+            if interest_reason and not cover_letter_section and 0 in kept:
+                cover_letter_future = executor.submit(in_trace_context(write_cover_letter), research_data[0])
+            
+            def on_result(index, result):
+                nonlocal cover_letter_future
+                if result:
+                    fetched_at[index] = time.time()
+                    checkpoint.record_section(queries[index], result, fetched_at[index])
+                # The cover letter only needs the company overview, so start it as soon as that arrives
+                if index == 0 and result and interest_reason and cover_letter_future is None:
+                    print("Company overview received, starting cover letter generation...")
+                    cover_letter_future = executor.submit(in_trace_context(write_cover_letter), result)
+            
+            with span("research"):
+                if RESEARCH_QUERY_PLAN == "consolidated":
+                    results = run_consolidated_research(queries, company_name, additional_info, search_fn,
+                                                        live_writer=live_writer, on_result=on_result, indices=stale)
+                else:
+                    results = run_research_queries(queries, company_name, search_fn, live_writer=live_writer,
+                                                   on_result=on_result, indices=stale)
+            for i in stale:
+                research_data[i] = results[i]
+            if facts_future:
+                try:
+                    company_facts = facts_future.result()
+                    if company_facts:
+                        facts_fetched_at = checkpoint.get("facts_fetched_at")
+                except Exception as e:
+                    print(f"Error fetching structured company facts: {e}")
+            if cover_letter_future:
+                try:
+                    cover_letter_section = cover_letter_future.result()
+                except Exception as e:
+                    print(f"Error generating cover letter: {e}")
+    
+    # A stale section is better than a missing one if its refresh failed
+    for i in stale:
+        if research_data[i] is None:
+            section = previous_section(previous_state, queries[i])
+            if section:
+                print(f"Keeping the previous '{queries[i]['title']}' section after its refresh failed")
+                research_data[i] = section["result"]
+                fetched_at[i] = section["fetched_at"]
+    
+    collected = sum(1 for data in research_data if data)
+    print(f"\nResearch complete. Collected data from {collected} of {len(queries)} queries")
+    
+    # Use the website from the structured facts if the user did not provide one
     company_website = company_url
     if not company_website:
         print("\nExtracting company website from research data...")
-        company_website = extract_company_website(research_data)
+        company_website = extract_company_website(research_data, company_facts)
         if company_website:
             print(f"Found company website: {company_website}")
         else:
             print("Could not extract company website from research data")
     
-    # If we couldn't find the website, try a direct search
-    if not company_website:
-        print("\nAttempting direct search for company website...")
-        website_query = f"What is the official website URL for {company_name} {additional_info if additional_info else ''}?"
-        if PERPLEXITY_API_KEY:
-            website_result = search_perplexity(website_query, company_name)
-            # In a real implementation, you would parse the result to extract the website
-        elif OPENROUTER_API_KEY:
-            website_result = search_openrouter(website_query, company_name)
-            # In a real implementation, you would parse the result to extract the website
-    
-    # Look up emails if we have a domain
+    # Look up emails if we have a domain, unless the previous lookup for it is still fresh
     email_data = None
-    if company_url:
-        print(f"\nExtracting domain from URL: {company_url}")
-        domain = extract_domain_from_website(company_url)
+    emails_fetched_at = None
+    if company_website and "email_data" in checkpoint and checkpoint.get("company_url") == company_website:
+        print(f"\nReusing email results for {company_website} from the checkpoint")
+        email_data = tuple(checkpoint.get("email_data"))
+        emails_fetched_at = checkpoint.get("emails_fetched_at")
+    elif (company_website and previous_state.get("company_url") == company_website
+            and is_fresh(previous_state.get("emails_fetched_at"), EMAILS_TTL_DAYS, now)):
+        print(f"\nReusing email results for {company_website} from the previous report")
+        email_data = tuple(previous_state["email_data"]) if previous_state.get("email_data") else None
+        emails_fetched_at = previous_state["emails_fetched_at"]
+    elif company_website:
+        print(f"\nExtracting domain from URL: {company_website}")
+        domain = extract_domain_from_website(company_website)
         if domain:
             print(f"Extracted domain: {domain}")
             hunter_results = search_hunter_io(domain)
@@ -1023,23 +1440,133 @@ def main():
                 print(f"Found {len(career_emails)} career emails, {len(founder_emails)} founder emails, "
                       f"{len(generic_emails)} generic emails, and {len(non_generic_emails)} non-generic emails")
                 email_data = (career_emails, founder_emails, generic_emails, non_generic_emails)
+                emails_fetched_at = time.time()
+                checkpoint.record(company_url=company_website, email_data=email_data,
+                                  emails_fetched_at=emails_fetched_at)
             else:
                 print("No email data found")
         else:
-            print(f"Could not extract domain from URL: {company_url}")
+            print(f"Could not extract domain from URL: {company_website}")
+    
+    if "location_restrictions" in checkpoint:
+        location_restrictions = checkpoint.get("location_restrictions")
+    else:
+        location_restrictions = extract_location_restrictions(research_data)
+        merge_location_facts(location_restrictions, company_facts)
+        checkpoint.record(location_restrictions=location_restrictions)
+    
+    # Write the cover letter here if it could not start early, so it is checkpointed before the report
+    if interest_reason and not cover_letter_section:
+        cover_letter_section = generate_cover_letter(company_name, interest_reason, research_data, company_facts)
+        if cover_letter_section:
+            checkpoint.record(cover_letter_section=cover_letter_section)
     
     # Generate and save the report
     print("\nGenerating report...")
-    report = generate_report(company_name, company_url, additional_info, research_data, email_data, interest_reason)
+    report = generate_report(company_name, company_website, additional_info, research_data, email_data, interest_reason,
+                             company_facts, cover_letter_section, location_restrictions)
     print("Report generated successfully")
     
+    if company_website:
+        location_restrictions["company_url"] = company_website
+    
+    # Record what each section was built from so a later --incremental run can reuse it
+    section_state = build_section_state(
+        company_name, queries, research_data, fetched_at,
+        company_url=company_website, additional_info=additional_info, interest_reason=interest_reason,
+        company_facts=company_facts, facts_fetched_at=facts_fetched_at,
+        email_data=email_data, emails_fetched_at=emails_fetched_at,
+        cover_letter_section=cover_letter_section,
+    )
+    
     print("\nSaving report to file...")
-    report_path = save_report(company_name, report)
+    report_path = save_report(company_name, report, location_restrictions, section_state)
+    checkpoint.remove()
     
-    print("\n" + "=" * 80)
-    print(f"Research completed for {company_name}.")
-    print(f"Report saved to {report_path}")
-    print("=" * 80 + "\n")
+    if live_writer:
+        live_writer.finish(report, report_path)
+    
+    return report_path
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Research companies with a focus on remote work.")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Research every company in a CSV or JSONL file instead of prompting")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Number of companies researched in parallel in batch mode (default: 2)")
+    parser.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT_REQUESTS,
+                        help=f"Maximum API requests in flight across all companies (default: {MAX_INFLIGHT_REQUESTS})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses into a live report that the viewer can show while research runs")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore cached API responses and fetch fresh ones (the cache is still updated)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the on-disk API response cache for this run")
+    parser.add_argument("--query-plan", choices=QUERY_PLANS, default=RESEARCH_QUERY_PLAN,
+                        help="Send one request per research section (split) or one for all sections (consolidated)")
+    parser.add_argument("--no-structured", action="store_true",
+                        help="Skip the structured company facts request")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only refresh the sections of the latest report that are older than their TTL")
+    parser.add_argument("--pdf-workers", type=int, default=PDF_WORKERS,
+                        help="Render PDFs on this many background processes; 0 renders them inline "
+                             f"(default: {PDF_WORKERS})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint instead of starting over")
+    parser.add_argument("--hedge-after", type=float, default=HEDGE_AFTER_SECONDS, metavar="SECONDS",
+                        help="Send a slow query to the other provider as well after this many seconds; 0 disables "
+                             f"hedging (default: {HEDGE_AFTER_SECONDS:g})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main function to run the company research agent."""
+    global STREAM_RESPONSES, STRUCTURED_EXTRACTION, RESEARCH_QUERY_PLAN, INCREMENTAL_RESEARCH, RESUME_RUNS
+    global HEDGE_AFTER_SECONDS
+    args = parse_args(argv)
+    RESEARCH_QUERY_PLAN = args.query_plan
+    HEDGE_AFTER_SECONDS = args.hedge_after
+    if args.stream:
+        STREAM_RESPONSES = True
+    if args.no_structured:
+        STRUCTURED_EXTRACTION = False
+    if args.incremental:
+        INCREMENTAL_RESEARCH = True
+    if args.resume:
+        RESUME_RUNS = True
+    set_max_inflight_requests(args.max_inflight)
+    configure_pdf_workers(args.pdf_workers)
+    if args.no_cache:
+        configure_cache(enabled=False)
+    configure_cache(refresh=args.refresh)
+    
+    # Print welcome message
+    print_welcome()
+    
+    # Setup environment
+    setup()
+    
+    try:
+        if args.batch:
+            from batch_research import run_batch
+            from hunter_bulk import prefetch_batch_domains
+            # Companies finished in an earlier batch are revisited when refreshing incrementally
+            run_batch(args.batch, research_company, workers=args.workers, skip_completed=not INCREMENTAL_RESEARCH,
+                      prefetch_fn=prefetch_batch_domains)
+            return
+        
+        # Get user input
+        company_name, company_url, additional_info, interest_reason = get_user_input()
+        
+        report_path = research_company(company_name, company_url, additional_info, interest_reason)
+        
+        print("\n" + "=" * 80)
+        print(f"Research completed for {company_name}.")
+        print(f"Report saved to {report_path}")
+        print("=" * 80 + "\n")
+    finally:
+        # PDFs queued on the worker pool may still be rendering
+        get_pdf_renderer().wait()
 
 if __name__ == "__main__":
     try:
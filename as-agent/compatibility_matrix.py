@@ -0,0 +1,278 @@
+"""Score many candidates against many researched companies at once.
+
+Loads the location restrictions of the newest run for each company in the
+artifact store (or every *_location.json in a directory) and every
+candidate profile in context-data/candidate/, then computes the full
+candidate x company compatibility matrix:
+
+- Locations are encoded as integer bitsets over the gazetteer's country and
+  subdivision codes, so each pair's region check is two bitwise ANDs.
+- Time zone overlap is looked up in an OverlapTable built once for all the
+  zones involved, and memoized per (candidate zone, requirement) pair.
+
+Usage:
+    python compatibility_matrix.py --output matrix.csv
+    python compatibility_matrix.py --output matrix.json --min-overlap 4
+"""
+import re
+import csv
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from artifact_store import get_artifact_store
+from gazetteer import get_gazetteer
+from timezones import (MIN_OVERLAP_HOURS, OverlapTable, resolve_candidate_time_zone,
+                       resolve_time_zone_requirements)
+
+AGENT_DIR = Path(__file__).parent
+CANDIDATE_DIR = AGENT_DIR.parent / "context-data" / "candidate"
+MATRIX_OUTPUT_DIR = AGENT_DIR / "outputs" / "compatibility"
+
+LOCATION_FILE_PATTERN = re.compile(r'^(.+)_(\d{8}_\d{6})_location$')
+
+# Columns of the CSV export, one row per candidate/company pair
+MATRIX_FIELDS = ["candidate", "company", "compatible", "region_ok", "excluded", "overlap_hours", "reasons"]
+
+def load_companies(json_dir=None, store=None):
+    """Return the newest saved location restrictions for each company, sorted by name.
+    
+    They are read from the artifact store unless json_dir names a directory
+    of *_location.json files, as written before the store existed.
+    """
+    if json_dir is None:
+        return load_store_companies(store or get_artifact_store())
+    
+    latest = {}
+    for path in Path(json_dir).glob("*_location.json"):
+        match = LOCATION_FILE_PATTERN.match(path.stem)
+        name, timestamp = (match.group(1), match.group(2)) if match else (path.stem[:-len("_location")], "")
+        if name in latest and latest[name][0] >= timestamp:
+            continue
+        try:
+            with open(path, 'r') as f:
+                latest[name] = (timestamp, json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Skipping {path.name}: {e}")
+    
+    return [{"name": name.replace('_', ' '), "restrictions": restrictions}
+            for name, (_, restrictions) in sorted(latest.items())]
+
+def load_store_companies(store):
+    """Return the location restrictions of each company's newest run in the artifact store."""
+    latest = {}
+    for manifest in store.read_index():
+        path = store.artifact_path(manifest, "location")
+        name = manifest["company_name"]
+        if path is None or (name in latest and latest[name][0] >= manifest["created_at"]):
+            continue
+        try:
+            with open(path, 'r') as f:
+                latest[name] = (manifest["created_at"], json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Skipping {path}: {e}")
+    
+    return [{"name": name, "restrictions": restrictions} for name, (_, restrictions) in sorted(latest.items())]
+
+def load_candidates(candidate_dir=CANDIDATE_DIR):
+    """Return every candidate profile in the candidate directory.
+    
+    Each file may hold a single profile or a list of them, like candidate.json.
+    """
+    candidates = []
+    for path in sorted(Path(candidate_dir).glob("*.json")):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Skipping {path.name}: {e}")
+            continue
+        
+        profiles = data if isinstance(data, list) else [data]
+        for index, profile in enumerate(profiles):
+            info = profile.get("personal_information", {}) if isinstance(profile, dict) else {}
+            name = info.get("name") or (path.stem if len(profiles) == 1 else f"{path.stem}[{index}]")
+            candidates.append({
+                "name": name,
+                "location": info.get("location", ""),
+                "timezone": info.get("timezone", ""),
+            })
+    return candidates
+
+class CodeBitsets:
+    """Maps gazetteer codes to bit positions so code sets become integers."""
+    
+    def __init__(self, gazetteer):
+        self.gazetteer = gazetteer
+        codes = sorted(set(gazetteer.countries) | set(gazetteer.subdivisions))
+        self.bits = {code: 1 << i for i, code in enumerate(codes)}
+    
+    def mask(self, codes):
+        value = 0
+        for code in codes:
+            value |= self.bits.get(code, 0)
+        return value
+    
+    def region_mask(self, regions):
+        """Return (mask, unresolved names) for a list of restriction values."""
+        value, unresolved = 0, []
+        for region in regions:
+            codes = self.gazetteer.resolve_region(region)
+            if codes is None:
+                unresolved.append(region)
+            else:
+                value |= self.mask(codes)
+        return value, unresolved
+
+def compute_matrix(candidates, companies, min_hours=MIN_OVERLAP_HOURS):
+    """Return a dict with candidate/company names and N x M result matrices."""
+    gazetteer = get_gazetteer()
+    bitsets = CodeBitsets(gazetteer)
+    
+    # Encode candidates: location codes and bitset, and time zone
+    candidate_codes, candidate_masks, candidate_zones = [], [], []
+    for candidate in candidates:
+        zone = resolve_candidate_time_zone(candidate["timezone"], candidate["location"])
+        codes = gazetteer.resolve_location(candidate["location"])
+        if not codes and gazetteer.country_for_zone(zone):
+            codes = frozenset([gazetteer.country_for_zone(zone)])
+        candidate_codes.append(codes)
+        candidate_masks.append(bitsets.mask(codes))
+        candidate_zones.append(zone)
+    
+    # Encode companies: allowed and excluded bitsets and required zones
+    columns = []
+    for company in companies:
+        restrictions = company["restrictions"]
+        allowed, unresolved_allowed = bitsets.region_mask(restrictions.get("restricted_to", []))
+        excluded, unresolved_excluded = bitsets.region_mask(restrictions.get("excluded_regions", []))
+        columns.append({
+            "restricted": bool(restrictions.get("restricted_to")),
+            "allowed": allowed,
+            "excluded": excluded,
+            "unresolved_allowed": unresolved_allowed,
+            "unresolved_excluded": unresolved_excluded,
+            "unresolved": unresolved_allowed + unresolved_excluded,
+            "zones": tuple(resolve_time_zone_requirements(restrictions.get("time_zone_requirements", ""))),
+        })
+    
+    zones = {zone for zone in candidate_zones if zone}
+    for column in columns:
+        zones.update(column["zones"])
+    overlap_table = OverlapTable(zones)
+    overlap_cache = {}
+    
+    compatible, overlap, details = [], [], []
+    for candidate, codes, mask, zone in zip(candidates, candidate_codes, candidate_masks, candidate_zones):
+        compatible_row, overlap_row, detail_row = [], [], []
+        location = candidate["location"]
+        
+        def in_regions(regions):
+            return any(gazetteer.in_region(region, codes, location) for region in regions)
+        
+        for company, column in zip(companies, columns):
+            reasons = []
+            restrictions = company["restrictions"]
+            
+            # Same decision as check_location_compatibility(): resolved regions are tested with
+            # the bitsets, unresolved names and unplaced candidates by comparing the names
+            if not location and not candidate["timezone"]:
+                region_ok, is_excluded = True, False
+                reasons.append("candidate location unknown")
+            elif mask:
+                region_ok = (not column["restricted"] or bool(mask & column["allowed"])
+                             or in_regions(column["unresolved_allowed"]))
+                is_excluded = bool(mask & column["excluded"]) or in_regions(column["unresolved_excluded"])
+            else:
+                region_ok = not column["restricted"] or in_regions(restrictions.get("restricted_to", []))
+                is_excluded = in_regions(restrictions.get("excluded_regions", []))
+            if not region_ok:
+                reasons.append("outside " + ", ".join(restrictions["restricted_to"]))
+            if is_excluded:
+                reasons.append("in an excluded region")
+            if column["unresolved"]:
+                reasons.append("unrecognised region " + ", ".join(column["unresolved"]))
+            
+            hours = None
+            if column["zones"] and zone:
+                key = (zone, column["zones"])
+                if key not in overlap_cache:
+                    overlap_cache[key] = overlap_table.best(zone, column["zones"])[1]
+                hours = overlap_cache[key]
+                if hours < min_hours:
+                    reasons.append(f"{hours:.1f}h time zone overlap")
+            
+            is_compatible = region_ok and not is_excluded and (hours is None or hours >= min_hours)
+            compatible_row.append(is_compatible)
+            overlap_row.append(hours)
+            detail_row.append({"region_ok": region_ok, "excluded": is_excluded, "reasons": reasons})
+        compatible.append(compatible_row)
+        overlap.append(overlap_row)
+        details.append(detail_row)
+    
+    return {
+        "candidates": [candidate["name"] for candidate in candidates],
+        "companies": [company["name"] for company in companies],
+        "min_overlap_hours": min_hours,
+        "compatible": compatible,
+        "overlap_hours": overlap,
+        "details": details,
+    }
+
+def export_matrix(matrix, output_path):
+    """Write the matrix as CSV (one row per pair) or JSON, based on the file extension."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    
+    if output_path.suffix.lower() == ".json":
+        with open(output_path, 'w') as f:
+            json.dump(matrix, f, indent=2)
+        return output_path
+    
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MATRIX_FIELDS)
+        writer.writeheader()
+        for i, candidate in enumerate(matrix["candidates"]):
+            for j, company in enumerate(matrix["companies"]):
+                detail = matrix["details"][i][j]
+                hours = matrix["overlap_hours"][i][j]
+                writer.writerow({
+                    "candidate": candidate,
+                    "company": company,
+                    "compatible": matrix["compatible"][i][j],
+                    "region_ok": detail["region_ok"],
+                    "excluded": detail["excluded"],
+                    "overlap_hours": "" if hours is None else f"{hours:.1f}",
+                    "reasons": "; ".join(detail["reasons"]),
+                })
+    return output_path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score candidate profiles against researched companies.")
+    parser.add_argument("--candidates", default=str(CANDIDATE_DIR), help="Directory of candidate profile JSON files")
+    parser.add_argument("--locations", help="Directory of saved *_location.json files (default: the artifact store)")
+    parser.add_argument("--output", help="Output file (.csv or .json); defaults to outputs/compatibility/")
+    parser.add_argument("--min-overlap", type=float, default=MIN_OVERLAP_HOURS,
+                        help="Shared working hours needed to meet a time zone requirement")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    candidates = load_candidates(args.candidates)
+    companies = load_companies(args.locations)
+    if not candidates or not companies:
+        print(f"Nothing to compare: found {len(candidates)} candidates and {len(companies)} companies.")
+        return
+    
+    matrix = compute_matrix(candidates, companies, args.min_overlap)
+    output_path = args.output or MATRIX_OUTPUT_DIR / f"compatibility_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    output_path = export_matrix(matrix, output_path)
+    
+    total = len(candidates) * len(companies)
+    matches = sum(row.count(True) for row in matrix["compatible"])
+    print(f"Compared {len(candidates)} candidates with {len(companies)} companies: {matches}/{total} compatible pairs.")
+    print(f"Matrix saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
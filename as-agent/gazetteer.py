@@ -0,0 +1,162 @@
+"""Country, region and bloc lookups for location restriction matching.
+
+The gazetteer in config-files/location-rules/gazetteer.json lists countries
+(by ISO 3166 alpha-2 code), a few subdivisions such as California, common
+city names and regional blocs (EU, EEA, North America, LATAM, EMEA, APAC...).
+It is loaded once into flat name -> country code indexes with every bloc
+already expanded to a frozenset of member countries, so restriction values
+and candidate locations both become code sets and a restriction check is a
+set intersection rather than a substring comparison.
+"""
+import json
+from pathlib import Path
+
+from location_rules import compile_phrases, normalize_phrase
+
+GAZETTEER_PATH = Path(__file__).parent.parent / "config-files" / "location-rules" / "gazetteer.json"
+
+def _expand_region(regions, code, seen=None):
+    """Return the member countries of a region, following its includes."""
+    seen = seen if seen is not None else set()
+    if code in seen:
+        return set()
+    seen.add(code)
+    
+    region = regions[code]
+    members = set(region.get("members", []))
+    for included in region.get("includes", []):
+        members |= _expand_region(regions, included, seen)
+    return members
+
+class Gazetteer:
+    """Resolves place and region names to sets of country and subdivision codes."""
+    
+    def __init__(self, data):
+        self.countries = data.get("countries", {})
+        self.subdivisions = data.get("subdivisions", {})
+        regions = data.get("regions", {})
+        self.regions = {code: frozenset(_expand_region(regions, code)) for code in regions}
+        
+        # Places a candidate can be located in: countries, subdivisions and cities.
+        # A candidate in a subdivision is also in its country, so "California"
+        # satisfies a United States restriction and a California exclusion.
+        self.place_names = {}
+        # Restriction values name a place by its own code only, so excluding
+        # California does not exclude the rest of the United States
+        self.region_names = {}
+        for code, country in self.countries.items():
+            for index in (self.place_names, self.region_names):
+                self._add_names(index, [country["name"], *country.get("aliases", [])], {code})
+        for code, subdivision in self.subdivisions.items():
+            names = [subdivision["name"], *subdivision.get("aliases", [])]
+            self._add_names(self.place_names, names, self._with_country(code))
+            self._add_names(self.region_names, names, {code})
+        for city, code in data.get("cities", {}).items():
+            self._add_names(self.place_names, [city], self._with_country(code))
+            self._add_names(self.region_names, [city], {code})
+        # Names that are only a city, which an explicit country or subdivision overrides
+        self.city_names = {normalize_phrase(city) for city in data.get("cities", {})}
+        for place in [*self.countries.values(), *self.subdivisions.values()]:
+            self.city_names -= {normalize_phrase(name) for name in [place["name"], *place.get("aliases", [])]}
+        
+        # Restriction values can also name a whole region
+        for code, region in regions.items():
+            self._add_names(self.region_names, [region["name"], *region.get("aliases", [])], self.regions[code])
+        
+        self.place_pattern = compile_phrases(self.place_names)
+        self.region_pattern = compile_phrases(self.region_names)
+        
+        self.zone_countries = {}
+        for code, country in self.countries.items():
+            for zone in country.get("zones", []):
+                self.zone_countries.setdefault(zone, code)
+    
+    @classmethod
+    def from_file(cls, path=GAZETTEER_PATH):
+        """Load a gazetteer from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def _with_country(self, code):
+        subdivision = self.subdivisions.get(code)
+        return {code, subdivision["country"]} if subdivision else {code}
+    
+    @staticmethod
+    def _add_names(index, names, codes):
+        for name in names:
+            key = normalize_phrase(name)
+            index[key] = frozenset(index.get(key, frozenset()) | codes)
+    
+    def _resolve(self, text, names, pattern, prefer_explicit=False):
+        if not text:
+            return frozenset()
+        key = normalize_phrase(text)
+        if key in names:
+            return names[key]
+        
+        codes, cities = set(), []
+        for match in pattern.finditer(text):
+            key = normalize_phrase(match.group(0))
+            if prefer_explicit and key in self.city_names:
+                cities.append(names[key])
+            else:
+                codes |= names[key]
+        for city_codes in cities:
+            if not codes or self._city_within(city_codes, codes):
+                codes |= city_codes
+        return frozenset(codes)
+    
+    def _city_within(self, city_codes, codes):
+        """Return True if a city lies in the countries and subdivisions named alongside it."""
+        if city_codes.isdisjoint(codes):
+            return False
+        named = {code for code in codes if code in self.subdivisions}
+        city_subdivisions = {code for code in city_codes if code in self.subdivisions}
+        return not (named and city_subdivisions and city_subdivisions.isdisjoint(named))
+    
+    def resolve_region(self, name):
+        """Resolve a restriction value such as "European Union" to country codes.
+        
+        Returns None if nothing in the value is known, so callers can tell an
+        unknown region apart from an empty one.
+        """
+        return self._resolve(name, self.region_names, self.region_pattern) or None
+    
+    def resolve_location(self, location):
+        """Resolve a location such as "Toronto, Canada" to the codes it lies in.
+        
+        A country or subdivision in the location takes precedence over a city
+        of the same name elsewhere, so "Paris, TX" is in Texas and "London,
+        Ontario" in Canada.
+        """
+        return self._resolve(location, self.place_names, self.place_pattern, prefer_explicit=True)
+    
+    def in_region(self, region, candidate_codes, candidate_location):
+        """Return True if a candidate with these location codes lies in a restriction region."""
+        region_codes = self.resolve_region(region)
+        if region_codes is None or not candidate_codes:
+            # Unknown region or location: fall back to comparing the names
+            return bool(candidate_location) and region.lower() in candidate_location.lower()
+        return not candidate_codes.isdisjoint(region_codes)
+    
+    def country_for_zone(self, zone):
+        """Return the country code for an IANA zone, or None."""
+        return self.zone_countries.get(zone)
+    
+    def default_zone(self, codes):
+        """Return a representative IANA zone for a set of location codes, or None."""
+        # Subdivisions are more specific than their country, so try them first
+        for code in sorted(codes, key=lambda c: c not in self.subdivisions):
+            place = self.subdivisions.get(code) or self.countries.get(code) or {}
+            if place.get("zones"):
+                return place["zones"][0]
+        return None
+
+_gazetteer = None
+
+def get_gazetteer():
+    """Return the shared gazetteer, loading it on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.from_file()
+    return _gazetteer
@@ -0,0 +1,189 @@
+"""Shared HTTP sessions for the Perplexity, OpenRouter and Hunter.io APIs.
+
+Each API host gets one pooled requests.Session, so repeated queries reuse
+kept-alive connections instead of paying a new TCP and TLS handshake every
+time. Every request has connect and read timeouts and counts against a
+global cap on requests in flight.
+"""
+import os
+import time
+import weakref
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import (
+    MAX_RETRIES,
+    RETRYABLE_STATUS_CODES,
+    backoff_delay,
+    get_rate_limiter,
+    parse_retry_after,
+)
+
+# Connections kept open per API host
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+# Seconds to wait for a connection and for the response (LLM completions can be slow)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "180"))
+
+# Global cap on API requests in flight across all companies and queries
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "8"))
+_inflight_requests = threading.BoundedSemaphore(MAX_INFLIGHT_REQUESTS)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Requests, retries and 429 responses sent from each thread, read by the spans in telemetry.py
+_request_stats = threading.local()
+
+def set_max_inflight_requests(limit):
+    """Change the global cap on concurrent API requests."""
+    global _inflight_requests
+    _inflight_requests = threading.BoundedSemaphore(max(1, limit))
+
+def request_stats():
+    """Return (requests, retries, throttled) counted so far on the calling thread."""
+    return (getattr(_request_stats, "requests", 0), getattr(_request_stats, "retries", 0),
+            getattr(_request_stats, "throttled", 0))
+
+def _count_request(name):
+    setattr(_request_stats, name, getattr(_request_stats, name, 0) + 1)
+
+def get_session(url):
+    """Return the pooled session for the host of a URL, creating it if needed."""
+    parts = urlsplit(url)
+    host_key = f"{parts.scheme}://{parts.netloc}"
+    
+    session = _sessions.get(host_key)
+    if session is not None:
+        return session
+    
+    with _sessions_lock:
+        session = _sessions.get(host_key)
+        if session is None:
+            session = requests.Session()
+            # Block instead of opening throwaway connections when the pool is exhausted
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=True)
+            session.mount(host_key, adapter)
+            session.headers.update({"Connection": "keep-alive"})
+            _sessions[host_key] = session
+    return session
+
+def _release_when_read(response, semaphore):
+    """Release a streamed response's in-flight slot once its body is read to the end or it is closed."""
+    lock = threading.Lock()
+    released = []
+    
+    def release():
+        with lock:
+            if released:
+                return
+            released.append(True)
+        semaphore.release()
+    
+    iter_content = response.iter_content
+    close = response.close
+    
+    def iter_content_and_release(*args, **kwargs):
+        try:
+            yield from iter_content(*args, **kwargs)
+        finally:
+            release()
+    
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+    
+    response.iter_content = iter_content_and_release
+    response.close = close_and_release
+    # A response dropped without being read or closed must not keep its slot
+    weakref.finalize(response, release)
+
+def _send(session, method, url, **kwargs):
+    """Send a request in an in-flight slot.
+    
+    A streamed response keeps its slot until the body has been read or the
+    response closed, so --max-inflight also limits long-running streams.
+    """
+    semaphore = _inflight_requests
+    semaphore.acquire()
+    try:
+        response = session.request(method, url, **kwargs)
+    except BaseException:
+        semaphore.release()
+        raise
+    if kwargs.get("stream"):
+        _release_when_read(response, semaphore)
+    else:
+        semaphore.release()
+    return response
+
+def request(method, url, provider=None, **kwargs):
+    """Send a request through the pooled session for the URL's host.
+    
+    When a provider is given, the request waits for that provider's rate
+    limiter and 429/5xx responses or connection errors are retried with
+    exponential backoff. The last response is returned once retries run out.
+    """
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    session = get_session(url)
+    _count_request("requests")
+    
+    if provider is None:
+        return _send(session, method, url, **kwargs)
+    
+    limiter = get_rate_limiter(provider)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            response = _send(session, method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{provider} request failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            attempt += 1
+            _count_request("retries")
+            continue
+        
+        limiter.update_from_headers(response.headers)
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            limiter.on_success()
+            return response
+        
+        if response.status_code == 429:
+            limiter.on_throttle()
+            _count_request("throttled")
+        if attempt >= MAX_RETRIES:
+            return response
+        
+        delay = backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+        print(f"{provider} returned status {response.status_code}, retrying in {delay:.1f}s "
+              f"(attempt {attempt + 1} of {MAX_RETRIES})...")
+        # An unread streamed body holds its connection, so release it to the pool before waiting
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+        _count_request("retries")
+
+def http_get(url, provider=None, **kwargs):
+    """Send a GET request through the shared client layer."""
+    return request("GET", url, provider=provider, **kwargs)
+
+def http_post(url, provider=None, **kwargs):
+    """Send a POST request through the shared client layer."""
+    return request("POST", url, provider=provider, **kwargs)
+
+def close_sessions():
+    """Close every pooled session."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,119 @@
+"""Bulk Hunter.io lookups for many domains at once.
+
+Domains are normalized and deduplicated first, so companies sharing a
+website are looked up once, then searched concurrently. Every request still
+goes through the "hunter" rate limiter in http_clients.py and each result
+lands in the per-domain cache, so the research runs that follow reuse them.
+
+In batch mode the domains of rows that already have a company_url are
+looked up this way alongside the research. Each finished lookup is kept in
+memory for the rest of the run, so the companies' own lookups reuse it even
+with the response cache off.
+
+Usage:
+    python hunter_bulk.py domains.txt --output emails.json
+    python hunter_bulk.py --batch companies.csv
+"""
+import os
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import company_research
+
+# Domains looked up at once; the rate limiter still caps requests per minute
+HUNTER_CONCURRENCY = int(os.getenv("HUNTER_CONCURRENCY", "4"))
+
+def unique_domains(websites):
+    """Return the distinct domains of the given websites or domains, in first-seen order."""
+    domains = []
+    for website in websites:
+        if not website:
+            continue
+        domain = company_research.extract_domain_from_website(website)
+        if domain and domain not in domains:
+            domains.append(domain)
+    return domains
+
+def lookup_domains(websites, workers=HUNTER_CONCURRENCY):
+    """Look up every distinct domain concurrently and return {domain: result or None}."""
+    domains = unique_domains(websites)
+    results = {}
+    if not domains:
+        return results
+    
+    print(f"\nLooking up {len(domains)} domains on Hunter.io with up to {workers} at once...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(domains)))) as executor:
+        futures = {executor.submit(company_research.search_hunter_io, domain): domain for domain in domains}
+        for future in as_completed(futures):
+            domain = futures[future]
+            try:
+                results[domain] = future.result()
+            except Exception as e:
+                print(f"Error looking up {domain}: {e}")
+                results[domain] = None
+    
+    found = sum(1 for result in results.values() if result)
+    print(f"Hunter.io lookups complete: {found} of {len(domains)} domains returned emails")
+    return results
+
+def prefetch_batch_domains(rows, workers=HUNTER_CONCURRENCY):
+    """Warm the Hunter.io cache for batch rows that give a company_url."""
+    websites = [row["company_url"] for row in rows if row.get("company_url")]
+    if websites and company_research.HUNTER_API_KEY:
+        lookup_domains(websites, workers)
+
+def summarize_results(results):
+    """Return the filtered contacts for each domain, as written by the CLI."""
+    summary = {}
+    for domain, result in results.items():
+        career_emails, founder_emails, generic_emails, non_generic_emails = \
+            company_research.filter_career_emails(result)
+        summary[domain] = {
+            "career": career_emails,
+            "founder": founder_emails,
+            "generic": generic_emails,
+            "team": non_generic_emails,
+        }
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Look up Hunter.io contacts for many domains at once.")
+    parser.add_argument("domains_file", nargs="?", help="Text file with one website or domain per line")
+    parser.add_argument("--batch", metavar="FILE", help="CSV or JSONL file of companies, as for company_research.py --batch")
+    parser.add_argument("--workers", type=int, default=HUNTER_CONCURRENCY,
+                        help=f"Domains looked up at once (default: {HUNTER_CONCURRENCY})")
+    parser.add_argument("--output", help="Where to write the contacts found, as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    websites = []
+    if args.domains_file:
+        with open(args.domains_file, 'r', encoding="utf-8") as f:
+            websites += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if args.batch:
+        from batch_research import load_batch_input
+        websites += [row["company_url"] for row in load_batch_input(args.batch)]
+    if not websites:
+        print("No domains given.")
+        return
+    if not company_research.HUNTER_API_KEY:
+        print("Set HUNTER_API_KEY to look up domains.")
+        return
+    
+    summary = summarize_results(lookup_domains(websites, args.workers))
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(exist_ok=True, parents=True)
+        with open(output_path, 'w', encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Contacts saved to {output_path}")
+    else:
+        for domain, contacts in summary.items():
+            counts = ", ".join(f"{len(emails)} {kind}" for kind, emails in contacts.items())
+            print(f"{domain}: {counts}")
+
+if __name__ == "__main__":
+    main()
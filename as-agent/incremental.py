@@ -0,0 +1,96 @@
+"""Per-section freshness for incremental re-research.
+
+Every saved run gets a sections.json artifact recording the raw result of
+each research query and when it was fetched, along with the company facts,
+Hunter.io results and cover letter. With --incremental, the agent loads the
+newest one for the company from the artifact store, re-issues only the
+queries whose result is older than that query's TTL and builds the new
+report from the fresh sections plus the ones it kept.
+"""
+import os
+import json
+import time
+
+from artifact_store import get_artifact_store
+
+SECTION_STATE_VERSION = 1
+
+# How long the non-query parts of a report stay fresh
+FACTS_TTL_DAYS = float(os.getenv("FACTS_TTL_DAYS", "30"))
+EMAILS_TTL_DAYS = float(os.getenv("EMAILS_TTL_DAYS", "30"))
+
+def is_fresh(fetched_at, ttl_days, now=None):
+    """Return True if something fetched at the given epoch time is younger than its TTL."""
+    if not fetched_at:
+        return False
+    return ((now or time.time()) - fetched_at) < ttl_days * 86400
+
+def find_latest_state(company_name, store=None):
+    """Return the newest section state saved for a company, or None."""
+    store = store or get_artifact_store()
+    for manifest in store.runs_for(company_name):
+        path = store.artifact_path(manifest, "sections")
+        if path is None:
+            continue
+        state = load_section_state(path)
+        if state is not None:
+            return state
+    return None
+
+def load_section_state(path):
+    """Load a section state file, returning None if it is missing, unreadable or from another version."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read section state {path}: {e}")
+        return None
+    if state.get("version") != SECTION_STATE_VERSION:
+        return None
+    return state
+
+def plan_refresh(state, queries, now=None):
+    """Split the queries into results to reuse and indices to re-issue.
+    
+    Returns (reused, stale): reused maps query index -> the saved section
+    (with "result" and "fetched_at"), stale lists the indices to fetch. A
+    section is reused only if the same query text was answered within the
+    query's ttl_days.
+    """
+    saved = {section["title"]: section for section in (state or {}).get("sections", [])}
+    reused, stale = {}, []
+    for i, query in enumerate(queries):
+        section = saved.get(query["title"])
+        if (section and section.get("result") and section.get("query") == query["query"]
+                and is_fresh(section.get("fetched_at"), query.get("ttl_days", 0), now)):
+            reused[i] = section
+        else:
+            stale.append(i)
+    return reused, stale
+
+def previous_section(state, query):
+    """Return the saved section answering the same query, however old, or None."""
+    for section in (state or {}).get("sections", []):
+        if section["title"] == query["title"] and section.get("query") == query["query"] and section.get("result"):
+            return section
+    return None
+
+def build_section_state(company_name, queries, research_data, fetched_at, **extras):
+    """Return the section state for a finished run."""
+    state = {
+        "version": SECTION_STATE_VERSION,
+        "company_name": company_name,
+        "saved_at": time.time(),
+        "sections": [
+            {
+                "title": query["title"],
+                "query": query["query"],
+                "ttl_days": query.get("ttl_days"),
+                "fetched_at": fetched_at[i],
+                "result": research_data[i] if i < len(research_data) else None,
+            }
+            for i, query in enumerate(queries)
+        ],
+    }
+    state.update(extras)
+    return state
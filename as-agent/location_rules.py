@@ -0,0 +1,127 @@
+"""Rule-based extraction of location and time zone restrictions.
+
+The rules live in config-files/location-rules/restriction-rules.json. Every
+phrase from every rule is compiled into a single case-insensitive regex
+shaped like a trie (shared prefixes are factored out), so each document is
+scanned once regardless of how many phrases the table holds. Phrases only
+match on word boundaries, so "est" does not fire inside "interest".
+"""
+import re
+import json
+from pathlib import Path
+
+RULES_PATH = Path(__file__).parent.parent / "config-files" / "location-rules" / "restriction-rules.json"
+
+# Fallback order if the rules file does not define one
+DEFAULT_SEVERITY_LEVELS = ["none", "low", "medium", "high"]
+
+def normalize_phrase(phrase):
+    """Lowercase a phrase and collapse runs of whitespace."""
+    return " ".join(phrase.lower().split())
+
+def _trie_to_regex(node):
+    """Convert a character trie into a regex fragment that prefers the longest match."""
+    terminal = "" in node
+    branches = []
+    for char in sorted(k for k in node if k != ""):
+        prefix = r"\s+" if char == " " else re.escape(char)
+        branches.append(prefix + _trie_to_regex(node[char]))
+    
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    
+    body = "(?:" + "|".join(branches) + ")"
+    # An optional group is greedy, so longer phrases win over their prefixes
+    return body + "?" if terminal else body
+
+def compile_phrases(phrases):
+    """Compile phrases into one word-bounded regex."""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in normalize_phrase(phrase):
+            node = node.setdefault(char, {})
+        node[""] = True
+    return re.compile(r"(?<!\w)" + _trie_to_regex(trie) + r"(?!\w)", re.IGNORECASE)
+
+class LocationRuleEngine:
+    """Single-pass matcher for a table of location restriction rules."""
+    
+    def __init__(self, config):
+        self.severity_levels = config.get("severity_levels", DEFAULT_SEVERITY_LEVELS)
+        self.severity_rank = {level: rank for rank, level in enumerate(self.severity_levels)}
+        self.rules = {rule["id"]: rule for rule in config.get("rules", [])}
+        
+        # Each normalized phrase maps to the rules (or context groups) it triggers
+        self.phrase_rules = {}
+        self.phrase_contexts = {}
+        for rule in config.get("rules", []):
+            for pattern in rule["patterns"]:
+                self.phrase_rules.setdefault(normalize_phrase(pattern), []).append(rule)
+        for context in config.get("context_rules", []):
+            for pattern in context["patterns"]:
+                self.phrase_contexts.setdefault(normalize_phrase(pattern), set()).add(context["id"])
+        
+        # A rule phrase such as "us time zones" consumes the context phrase inside
+        # it during the scan, so it has to supply that context itself
+        for phrase in self.phrase_rules:
+            for context_phrase, context_ids in list(self.phrase_contexts.items()):
+                if phrase != context_phrase and re.search(r"(?<!\w)" + re.escape(context_phrase) + r"(?!\w)", phrase):
+                    self.phrase_contexts.setdefault(phrase, set()).update(context_ids)
+        
+        phrases = set(self.phrase_rules) | set(self.phrase_contexts)
+        self.pattern = compile_phrases(phrases) if phrases else None
+    
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        """Load a rule table from a JSON file."""
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+    
+    def severity(self, level):
+        """Return the ordinal rank of a severity level."""
+        return self.severity_rank.get(level, 0)
+    
+    def scan(self, text, document=None):
+        """Return the rule matches in a text, in order of appearance.
+        
+        Each match is a dict with the rule id, kind, value, severity, the
+        matched text and its start/end offsets. Rules that require a context
+        (such as a time zone abbreviation needing "overlap" or "working hours"
+        somewhere in the same document) are dropped if the context never appears.
+        """
+        if not text or self.pattern is None:
+            return []
+        
+        candidates = []
+        contexts_seen = set()
+        for match in self.pattern.finditer(text):
+            phrase = normalize_phrase(match.group(0))
+            contexts_seen.update(self.phrase_contexts.get(phrase, ()))
+            for rule in self.phrase_rules.get(phrase, ()):
+                candidates.append({
+                    "rule": rule["id"],
+                    "kind": rule["kind"],
+                    "value": rule["value"],
+                    "severity": rule.get("severity", "none"),
+                    "text": match.group(0),
+                    "start": match.start(),
+                    "end": match.end(),
+                    "document": document,
+                })
+        
+        return [
+            candidate for candidate in candidates
+            if self.rules[candidate["rule"]].get("requires_context") in (None, *contexts_seen)
+        ]
+
+_engine = None
+
+def get_rule_engine():
+    """Return the shared rule engine, loading the rules file on first use."""
+    global _engine
+    if _engine is None:
+        _engine = LocationRuleEngine.from_file()
+    return _engine
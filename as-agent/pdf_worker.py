@@ -0,0 +1,114 @@
+"""PDF rendering for saved reports, inline or on a pool of worker processes.
+
+Rendering a report to PDF is CPU-bound and the slowest step at the end of a
+run. With PDF_WORKERS (or --pdf-workers) above zero, save_report() queues
+the PDF on a process pool and returns as soon as the Markdown is written,
+so a batch keeps researching while PDFs render in parallel across cores.
+Each run's manifest records the PDF status (pending, ready or failed),
+which the report viewer shows next to the report.
+"""
+import os
+import time
+import threading
+import importlib.util
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from telemetry import current_trace
+
+# Worker processes rendering PDFs; 0 renders each PDF inline before save_report() returns
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+
+def pdf_available():
+    """Return True if the markdown-pdf package is installed."""
+    return importlib.util.find_spec("markdown_pdf") is not None
+
+def render_pdf(markdown_path, pdf_path):
+    """Convert a Markdown report to PDF. Runs in a worker process when the pool is used."""
+    from markdown_pdf import MarkdownPdf
+    
+    md_pdf = MarkdownPdf()
+    md_pdf.convert_markdown_to_pdf(str(markdown_path), str(pdf_path))
+    return str(pdf_path)
+
+class PdfRenderer:
+    """Renders the PDF of each saved run and records the result in the run's manifest."""
+    
+    def __init__(self, workers=PDF_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+    
+    def submit(self, run, markdown_path):
+        """Render the PDF for a run's report, in the background if workers are configured."""
+        if not pdf_available():
+            print("PDF generation skipped. Please install required dependencies with: pip install markdown-pdf")
+            return
+        
+        pdf_name = Path(markdown_path).with_suffix(".pdf").name
+        tmp_path = run.temp_path(pdf_name)
+        # The "pdf" span of a queued render includes its wait for a free worker
+        timing = (current_trace(), time.time(), time.perf_counter())
+        if self.workers <= 0:
+            print(f"Generating PDF report: {run.path / pdf_name}")
+            try:
+                render_pdf(markdown_path, tmp_path)
+                self._finish(run, tmp_path, pdf_name, None, timing)
+            except Exception as e:
+                self._finish(run, tmp_path, pdf_name, e, timing)
+            return
+        
+        run.update(pdf_status="pending")
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._executor.submit(render_pdf, markdown_path, tmp_path)
+            self._pending.add(future)
+        print(f"Queued PDF report: {run.path / pdf_name}")
+        future.add_done_callback(lambda f: self._done(f, run, tmp_path, pdf_name, timing))
+    
+    def _done(self, future, run, tmp_path, pdf_name, timing):
+        with self._lock:
+            self._pending.discard(future)
+        self._finish(run, tmp_path, pdf_name, future.exception(), timing)
+    
+    def _finish(self, run, tmp_path, pdf_name, error, timing):
+        trace, started, start = timing
+        if trace:
+            trace.add_span("pdf", started, time.perf_counter() - start, status="ok" if error is None else "error",
+                           queued=self.workers > 0 or None)
+        
+        if error is None:
+            run.add_file(tmp_path, pdf_name, kind="pdf")
+            run.update(pdf_status="ready")
+            print(f"PDF report generated successfully: {run.path / pdf_name}")
+            return
+        
+        print(f"Error generating PDF for {run.run_id}: {error}")
+        Path(tmp_path).unlink(missing_ok=True)
+        run.update(pdf_status="failed")
+    
+    def wait(self):
+        """Wait for every queued PDF and stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending = len(self._pending)
+        if executor is None:
+            return
+        if pending:
+            print(f"\nWaiting for {pending} PDF reports to finish rendering...")
+        executor.shutdown(wait=True)
+
+_renderer = None
+
+def get_pdf_renderer():
+    """Return the shared PDF renderer."""
+    global _renderer
+    if _renderer is None:
+        _renderer = PdfRenderer()
+    return _renderer
+
+def configure_pdf_workers(workers):
+    """Set the number of PDF worker processes used by the shared renderer."""
+    get_pdf_renderer().workers = max(0, workers)
@@ -0,0 +1,180 @@
+"""Routing research requests across Perplexity and OpenRouter.
+
+When both API keys are configured, every query goes to the healthier
+provider first. If it fails (an error or no answer), the query fails over
+to the other provider straight away. If it is still running after
+HEDGE_AFTER_SECONDS, a hedged duplicate goes to the other provider and
+whichever answers first is used, which cuts the slow tail of a company's
+queries. The losing request is left to finish in the background.
+
+Provider health is an exponentially weighted moving average of latency and
+error rate, shared by all companies in the process. The primary is the
+provider with the lowest expected time to a successful answer.
+"""
+import os
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from telemetry import in_trace_context, span
+
+# Seconds before a hedged duplicate is sent to the other provider; 0 disables hedging
+HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "45"))
+
+# Weight of the newest sample in the latency and error rate averages
+HEALTH_EWMA_ALPHA = float(os.getenv("PROVIDER_HEALTH_ALPHA", "0.3"))
+
+# Threads sending routed requests; each routed query uses at most two
+ROUTER_MAX_WORKERS = 32
+
+class ProviderHealth:
+    """Moving averages of one provider's latency and error rate."""
+    
+    def __init__(self, name, alpha=HEALTH_EWMA_ALPHA):
+        self.name = name
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, seconds, ok):
+        """Add the outcome of one request."""
+        with self._lock:
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+            if ok:
+                self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+    
+    def score(self):
+        """Return the expected seconds to a successful answer, or None before the first success."""
+        with self._lock:
+            if self.latency is None:
+                return None
+            return self.latency / max(0.05, 1.0 - self.error_rate)
+
+_health = {}
+_health_lock = threading.Lock()
+
+def get_provider_health(name):
+    """Return the shared health record for a provider."""
+    with _health_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth(name)
+        return _health[name]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ROUTER_MAX_WORKERS, thread_name_prefix="provider")
+        return _executor
+
+class ProviderRouter:
+    """A search function that routes each query across several providers.
+    
+    providers is a list of (name, search_fn) in order of preference, used
+    until the providers have a health record. Called like search_perplexity().
+    """
+    
+    def __init__(self, providers, hedge_after=HEDGE_AFTER_SECONDS):
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+    
+    def ranked(self):
+        """Return the providers, healthiest first; those with no successful answer yet keep their order at the end."""
+        def key(item):
+            index, (name, _) = item
+            score = get_provider_health(name).score()
+            return (score is None, score or 0.0, index)
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+    
+    def __call__(self, query, company_name, on_token=None, json_schema=None):
+        ranked = self.ranked()
+        with span("provider_route") as attrs:
+            attrs["primary"] = ranked[0][0]
+            result, winner = self._route(ranked, attrs, query, company_name, on_token, json_schema)
+            attrs["winner"] = winner
+            return result
+    
+    def _route(self, ranked, attrs, query, company_name, on_token, json_schema):
+        # One provider at a time streams into the live report: the first to produce a token, until
+        # the query fails over or another provider wins. Every provider's text is kept so the
+        # live section can be rewritten from the provider that takes over.
+        stream = {"owner": None, "done": False}
+        texts = {name: [] for name, _ in ranked}
+        stream_lock = threading.Lock()
+        
+        def forward(name):
+            def on_provider_token(fragment):
+                with stream_lock:
+                    texts[name].append(fragment)
+                    if stream["done"] or stream["owner"] not in (None, name):
+                        return
+                    stream["owner"] = name
+                    on_token(fragment)
+            return on_provider_token
+        
+        def hand_stream_to(name):
+            with stream_lock:
+                previous = stream["owner"]
+                if previous in (None, name):
+                    stream["owner"] = name
+                elif on_token and hasattr(on_token, "replace"):
+                    stream["owner"] = name
+                    on_token.replace("".join(texts[name]))
+        
+        def attempt(name, search_fn):
+            start = time.perf_counter()
+            result = None
+            try:
+                kwargs = {"json_schema": json_schema} if json_schema else {}
+                if on_token:
+                    kwargs["on_token"] = forward(name)
+                result = search_fn(query, company_name, **kwargs)
+                return result
+            except Exception as e:
+                print(f"Error searching {name}: {e}")
+                return None
+            finally:
+                get_provider_health(name).record(time.perf_counter() - start, result is not None)
+        
+        executor = _get_executor()
+        pending = {}
+        waiting = list(ranked)
+        
+        def launch():
+            name, search_fn = waiting.pop(0)
+            pending[executor.submit(in_trace_context(attempt), name, search_fn)] = name
+        
+        launch()
+        try:
+            while pending:
+                # Wait for the hedge threshold while another provider is left to try, otherwise for an answer
+                timeout = self.hedge_after if waiting and self.hedge_after > 0 else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    print(f"No answer from {', '.join(pending.values())} after {self.hedge_after:g}s, "
+                          f"sending a hedged request to {waiting[0][0]}...")
+                    attrs["hedged"] = True
+                    launch()
+                    continue
+                
+                for future in done:
+                    name = pending.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        hand_stream_to(name)
+                        return result, name
+                    if waiting:
+                        print(f"{name} did not answer, failing over to {waiting[0][0]}...")
+                        attrs["failed_over"] = True
+                        launch()
+                    if pending:
+                        # The failed provider's partial text gives way to one still answering
+                        hand_stream_to(next(iter(pending.values())))
+            return None, None
+        finally:
+            with stream_lock:
+                stream["done"] = True
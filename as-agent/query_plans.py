@@ -0,0 +1,87 @@
+"""Query plans for the research stage.
+
+The "split" plan sends each research query as its own request. The
+"consolidated" plan asks for every section in one request and tells the
+model to start each section with a delimiter line, which is then used to
+split the answer back into one result per query, so the report and the
+live viewer see the same sections either way.
+"""
+import re
+
+QUERY_PLANS = ("split", "consolidated")
+
+SECTION_DELIMITER = "=== SECTION: {title} ==="
+SECTION_PATTERN = re.compile(r'^\s*=+\s*SECTION:\s*(.+?)\s*=+\s*$', re.MULTILINE | re.IGNORECASE)
+
+def build_consolidated_query(company_name, additional_info, queries):
+    """Combine the research queries into one prompt with delimited section output."""
+    subject = f"{company_name} ({additional_info})" if additional_info else company_name
+    lines = [
+        f"Research the company {subject} and write a report with exactly {len(queries)} sections, in this order.",
+        "Start each section with its delimiter line exactly as shown, on a line of its own, then the section text.",
+        "Give each section the depth you would give it as a standalone answer and cite sources where available.",
+        "",
+    ]
+    for query in queries:
+        lines.append(SECTION_DELIMITER.format(title=query["title"]))
+        lines.append(f"Cover: {query['query']}")
+        lines.append("")
+    return "\n".join(lines)
+
+def _title_index(titles):
+    return {title.lower(): i for i, title in enumerate(titles)}
+
+def split_sections(text, titles):
+    """Split a delimited answer into one text per title, with None for missing sections."""
+    sections = [None] * len(titles)
+    index = _title_index(titles)
+    matches = list(SECTION_PATTERN.finditer(text or ""))
+    for n, match in enumerate(matches):
+        i = index.get(match.group(1).lower())
+        if i is None:
+            continue
+        end = matches[n + 1].start() if n + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if body:
+            sections[i] = body if sections[i] is None else sections[i] + "\n\n" + body
+    return sections
+
+class SectionTokenRouter:
+    """Routes streamed tokens of a consolidated answer to the live report section they belong to."""
+    
+    def __init__(self, live_writer, titles):
+        self.live_writer = live_writer
+        self.index = _title_index(titles)
+        self.current = None
+        self.pending = ""
+        self.written = set()
+    
+    def __call__(self, fragment):
+        self.pending += fragment
+        # Only complete lines can be checked for a delimiter
+        while "\n" in self.pending:
+            line, self.pending = self.pending.split("\n", 1)
+            self._route(line + "\n")
+    
+    def _route(self, line):
+        match = SECTION_PATTERN.match(line)
+        if match and match.group(1).lower() in self.index:
+            self.current = self.index[match.group(1).lower()]
+        elif self.current is not None:
+            self.written.add(self.current)
+            self.live_writer.append(self.current, line)
+    
+    def replace(self, text):
+        """Clear the sections streamed so far and route text from the start instead."""
+        for i in self.written:
+            self.live_writer.replace(i, "")
+        self.written = set()
+        self.current = None
+        self.pending = ""
+        self(text)
+    
+    def flush(self):
+        """Route whatever is left after the last newline."""
+        if self.pending:
+            self._route(self.pending)
+            self.pending = ""
@@ -0,0 +1,156 @@
+"""Adaptive per-provider rate limiting for the research APIs.
+
+Each provider has a token bucket that paces outgoing requests. The bucket
+reads Retry-After and rate-limit headers from responses, halves its rate
+when the provider throttles us and slowly speeds back up while requests
+succeed.
+"""
+import os
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+# Requests per minute allowed per provider before any adaptation
+PROVIDER_RATE_LIMITS = {
+    "perplexity": float(os.getenv("PERPLEXITY_REQUESTS_PER_MINUTE", "50")),
+    "openrouter": float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "60")),
+    "hunter": float(os.getenv("HUNTER_REQUESTS_PER_MINUTE", "300")),
+}
+
+# Retries for 429 and 5xx responses, and the base delay for exponential backoff
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = float(os.getenv("API_BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX_SECONDS = 60.0
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to provider feedback."""
+    
+    def __init__(self, requests_per_minute, burst=None):
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = self.max_rate / 16
+        self.rate = self.max_rate
+        self.capacity = burst or max(1.0, min(10.0, requests_per_minute / 6))
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+    
+    def on_success(self):
+        """Speed back up gradually after successful requests."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+    
+    def on_throttle(self):
+        """Halve the request rate after a 429."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+    
+    def update_from_headers(self, headers):
+        """Pause when the provider says the rate limit window is used up."""
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            self.pause(retry_after)
+            return
+        
+        remaining = _first_header(headers, ["X-RateLimit-Remaining-Requests", "X-RateLimit-Remaining"])
+        reset = _first_header(headers, ["X-RateLimit-Reset-Requests", "X-RateLimit-Reset"])
+        try:
+            if remaining is not None and float(remaining) <= 0 and reset is not None:
+                reset_seconds = parse_reset(reset)
+                if reset_seconds is not None:
+                    self.pause(reset_seconds)
+        except ValueError:
+            pass
+
+def _first_header(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_reset(value):
+    """Parse a rate-limit reset header into seconds from now.
+    
+    Providers send either seconds ("30"), an epoch timestamp ("1712345678")
+    or a duration string ("1m30s", "250ms").
+    """
+    value = value.strip()
+    try:
+        number = float(value)
+        # Values this large are epoch timestamps (in seconds or milliseconds)
+        if number > 1e12:
+            return max(0.0, number / 1000 - time.time())
+        if number > 1e9:
+            return max(0.0, number - time.time())
+        return max(0.0, number)
+    except ValueError:
+        pass
+    
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+def backoff_delay(attempt, retry_after=None):
+    """Return the delay before a retry: Retry-After if given, else exponential backoff with jitter."""
+    if retry_after is not None:
+        return min(BACKOFF_MAX_SECONDS, retry_after) + random.uniform(0, BACKOFF_BASE_SECONDS)
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(BACKOFF_BASE_SECONDS / 2, ceiling)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider):
+    """Return the shared token bucket for a provider."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = TokenBucket(PROVIDER_RATE_LIMITS.get(provider, 60))
+            _limiters[provider] = limiter
+        return limiter
@@ -0,0 +1,162 @@
+"""Persistent cache for Perplexity, OpenRouter and Hunter.io responses.
+
+Responses are stored in a SQLite database under outputs/cache, keyed on a
+hash of the provider, model, messages and request parameters. Each provider
+has its own time-to-live and the database is kept under a size limit by
+evicting the least recently used entries.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+CACHE_PATH = Path(__file__).parent / "outputs" / "cache" / "responses.sqlite3"
+
+# How long a cached response stays fresh, in days, per provider
+CACHE_TTL_DAYS = {
+    "perplexity": float(os.getenv("PERPLEXITY_CACHE_TTL_DAYS", "7")),
+    "openrouter": float(os.getenv("OPENROUTER_CACHE_TTL_DAYS", "7")),
+    "hunter": float(os.getenv("HUNTER_CACHE_TTL_DAYS", "30")),
+}
+
+# Least recently used entries are evicted once the cache grows past this size
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "200"))
+
+def make_cache_key(provider, model=None, messages=None, params=None):
+    """Return a content hash identifying a request."""
+    payload = {
+        "provider": provider,
+        "model": model,
+        "messages": messages,
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """SQLite-backed response cache with per-provider TTLs and LRU eviction."""
+    
+    def __init__(self, path=CACHE_PATH, ttl_days=None, max_mb=CACHE_MAX_MB, refresh=False):
+        self.path = Path(path)
+        self.ttl_days = dict(CACHE_TTL_DAYS)
+        if ttl_days:
+            self.ttl_days.update(ttl_days)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # When refreshing, lookups always miss but fresh responses are still stored
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                size INTEGER NOT NULL,
+                value TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    def get(self, provider, key):
+        """Return the cached value for a key, or None if missing or expired."""
+        if self.refresh:
+            self.misses += 1
+            return None
+        
+        now = time.time()
+        max_age = self.ttl_days.get(provider, 7) * 86400
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[0] > max_age:
+                self.misses += 1
+                return None
+            
+            self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        
+        return json.loads(row[1])
+    
+    def set(self, provider, key, value):
+        """Store a JSON-serializable value and evict old entries if needed."""
+        encoded = json.dumps(value, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        now = time.time()
+        
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, created_at, last_accessed, size, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, now, now, size, encoded)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits its size limit."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_accessed ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+    
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+_cache = None
+_cache_enabled = os.getenv("RESPONSE_CACHE", "1").lower() not in ("0", "false", "no")
+_cache_refresh = False
+_cache_init_lock = threading.Lock()
+
+def configure_cache(enabled=None, refresh=None):
+    """Enable or disable the cache, or force fresh responses for this run."""
+    global _cache_enabled, _cache_refresh
+    if enabled is not None:
+        _cache_enabled = enabled
+    if refresh is not None:
+        _cache_refresh = refresh
+        if _cache is not None:
+            _cache.refresh = refresh
+
+def get_response_cache():
+    """Return the shared response cache, or None if caching is disabled."""
+    global _cache
+    if not _cache_enabled:
+        return None
+    
+    if _cache is None:
+        with _cache_init_lock:
+            if _cache is None:
+                try:
+                    _cache = ResponseCache(refresh=_cache_refresh)
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not open response cache: {e}")
+                    return None
+    return _cache
@@ -0,0 +1,155 @@
+"""Streaming support for chat-completion responses.
+
+Parses the server-sent event (SSE) stream returned by Perplexity and
+OpenRouter when "stream": true is set, and assembles an in-progress report
+on disk as tokens arrive so the report viewer can show it before the run
+finishes.
+"""
+import json
+import time
+import threading
+from pathlib import Path
+
+# Live reports are written here while a run is in progress
+LIVE_OUTPUT_DIR = Path(__file__).parent / "outputs" / "live"
+
+# Minimum seconds between rewrites of a live report file
+LIVE_FLUSH_INTERVAL = 0.5
+
+def iter_sse_events(response):
+    """Yield the decoded JSON payload of each SSE data event until [DONE]."""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or line.startswith(":"):
+            # Blank separators and keep-alive comments carry no data
+            continue
+        if not line.startswith("data:"):
+            continue
+        
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            yield json.loads(payload)
+        except json.JSONDecodeError:
+            print(f"Warning: Skipping malformed stream event: {payload[:100]}")
+
+def collect_stream(response, on_token=None):
+    """Consume a chat-completions stream and return a non-streaming style response.
+    
+    on_token is called with each content fragment as it arrives. The returned
+    dict has the same shape as a regular completion, so caching and text
+    extraction do not need to know the response was streamed.
+    """
+    content_parts = []
+    result = {}
+    
+    for event in iter_sse_events(response):
+        for key in ("id", "model", "citations", "usage"):
+            if event.get(key):
+                result[key] = event[key]
+        
+        choices = event.get("choices") or []
+        if not choices:
+            continue
+        delta = choices[0].get("delta") or {}
+        fragment = delta.get("content")
+        if fragment:
+            content_parts.append(fragment)
+            if on_token:
+                on_token(fragment)
+    
+    result["choices"] = [{"message": {"role": "assistant", "content": "".join(content_parts)}}]
+    return result
+
+class LiveReportWriter:
+    """Writes a research report to disk section by section while it streams in.
+    
+    Sections can receive text concurrently. The file is rewritten atomically
+    at most every LIVE_FLUSH_INTERVAL seconds, with sections in query order.
+    A JSON status file next to the report tells the viewer whether the run
+    is still going.
+    """
+    
+    def __init__(self, company_name, titles, filename):
+        LIVE_OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
+        self.company_name = company_name
+        self.titles = list(titles)
+        self.sections = [[] for _ in self.titles]
+        self.path = LIVE_OUTPUT_DIR / filename
+        self.status_path = self.path.with_suffix(".status.json")
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._write_status("running")
+        self.flush(force=True)
+    
+    def append(self, index, text):
+        """Add streamed text to a section and flush if enough time has passed."""
+        with self._lock:
+            self.sections[index].append(text)
+        self.flush()
+    
+    def replace(self, index, text):
+        """Replace a section's text, e.g. when another provider's answer is used instead."""
+        with self._lock:
+            self.sections[index] = [text] if text else []
+        self.flush(force=True)
+    
+    def section(self, index):
+        """Return an on_token callback streaming into one section."""
+        return LiveSection(self, index)
+    
+    def render(self):
+        """Return the in-progress report as markdown."""
+        with self._lock:
+            parts = [f"# {self.company_name} Research Report\n\n", "*Research in progress...*\n\n", "## Research Data\n\n"]
+            for title, chunks in zip(self.titles, self.sections):
+                parts.append(f"### {title}\n\n")
+                parts.append(("".join(chunks) or "*Waiting for response...*") + "\n\n")
+        return "".join(parts)
+    
+    def flush(self, force=False):
+        """Rewrite the live report file if it is due."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < LIVE_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self._write_atomic(self.path, self.render())
+    
+    def finish(self, report, report_path=None):
+        """Replace the live file with the final report and mark the run complete."""
+        self._write_atomic(self.path, report)
+        self._write_status("done", report_path)
+    
+    def fail(self, error):
+        """Mark the run as failed, keeping whatever was streamed so far."""
+        self.flush(force=True)
+        self._write_status("failed", error=str(error))
+    
+    def _write_status(self, state, report_path=None, error=None):
+        status = {
+            "company_name": self.company_name,
+            "state": state,
+            "updated_at": time.time(),
+            "report_path": str(report_path) if report_path else None,
+            "error": error,
+        }
+        self._write_atomic(self.status_path, json.dumps(status, indent=2))
+    
+    def _write_atomic(self, path, text):
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        tmp_path.replace(path)
+
+class LiveSection:
+    """on_token callback for one section of a live report; replace() rewrites the section."""
+    
+    def __init__(self, live_writer, index):
+        self.live_writer = live_writer
+        self.index = index
+    
+    def __call__(self, fragment):
+        self.live_writer.append(self.index, fragment)
+    
+    def replace(self, text):
+        self.live_writer.replace(self.index, text)
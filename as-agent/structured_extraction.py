@@ -0,0 +1,184 @@
+"""Structured extraction of company facts with a single schema-constrained request.
+
+Instead of recovering the website, headquarters or remote policy from the
+research prose afterwards, one request asks the model to answer with JSON
+matching config-files/templates/json/company-facts.md. The response is
+parsed and validated against the schema; fields that do not validate are
+dropped rather than failing the run.
+"""
+import re
+import json
+from pathlib import Path
+
+from telemetry import traced
+
+SCHEMA_DIR = Path(__file__).parent.parent / "config-files" / "templates" / "json"
+COMPANY_FACTS_SCHEMA_PATH = SCHEMA_DIR / "company-facts.md"
+COVER_LETTER_SCHEMA_PATH = SCHEMA_DIR / "cover-letter.md"
+
+# Human-readable labels for the enum values in the schema
+REMOTE_POLICY_LABELS = {
+    "fully_remote": "Fully remote",
+    "remote_first": "Remote-first",
+    "hybrid": "Hybrid",
+    "office_first": "Office-first",
+    "unknown": "Unknown",
+}
+
+_schemas = {}
+
+def load_json_schema(path):
+    """Load a JSON schema, allowing it to be wrapped in a ```json fence like the other templates."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    fenced = re.search(r'```(?:json)?\s*(.*?)```', text, re.DOTALL)
+    return json.loads(fenced.group(1) if fenced else text)
+
+def get_schema(path):
+    """Return a schema, loading it on first use."""
+    if path not in _schemas:
+        _schemas[path] = load_json_schema(path)
+    return _schemas[path]
+
+def get_company_facts_schema():
+    """Return the company facts schema."""
+    return get_schema(COMPANY_FACTS_SCHEMA_PATH)
+
+def get_cover_letter_schema():
+    """Return the schema for the combined cover letter and subject lines response."""
+    return get_schema(COVER_LETTER_SCHEMA_PATH)
+
+def build_facts_query(company_name, additional_info=""):
+    """Return the prompt for the structured company facts request."""
+    subject = f"{company_name} ({additional_info})" if additional_info else company_name
+    return (
+        f"Research the company {subject} and report the facts below as a single JSON object. "
+        "Use an empty string, empty list or \"unknown\" when something cannot be verified; do not guess. "
+        "Fields: the official website URL; headquarters (city, country); company size "
+        "(micro <10, small <100, medium 100-999, large 1000+) and approximate employee count; a one-sentence "
+        "description; the remote work policy and a short summary of it; the countries or regions remote "
+        "employees must be based in; regions the company does not hire in; and the time zones employees "
+        "must overlap with."
+    )
+
+def parse_json_response(text):
+    """Parse a JSON object from a model response, tolerating code fences and surrounding prose."""
+    if not text:
+        return None
+    text = text.strip()
+    fenced = re.search(r'```(?:json)?\s*(.*?)```', text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            value = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+    return value if isinstance(value, dict) else None
+
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+
+def schema_errors(value, schema, path="$"):
+    """Return a list of validation errors for the subset of JSON Schema used by the templates."""
+    errors = []
+    types = schema.get("type")
+    if types:
+        types = types if isinstance(types, list) else [types]
+        if not any(_TYPE_CHECKS[t](value) for t in types if t in _TYPE_CHECKS):
+            return [f"{path}: expected {' or '.join(types)}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    if isinstance(value, dict):
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: missing")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(schema_errors(value[name], subschema, f"{path}.{name}"))
+    return errors
+
+def validate_company_facts(value, schema=None):
+    """Return (facts, errors): the fields that validate, and the errors for those that do not."""
+    schema = schema or get_company_facts_schema()
+    if not isinstance(value, dict):
+        return None, ["$: expected object"]
+    
+    facts, errors = {}, []
+    for name, subschema in schema.get("properties", {}).items():
+        if name not in value:
+            if name in schema.get("required", []):
+                errors.append(f"$.{name}: missing")
+            continue
+        field_errors = schema_errors(value[name], subschema, f"$.{name}")
+        if field_errors:
+            errors.extend(field_errors)
+        else:
+            facts[name] = value[name]
+    return facts, errors
+
+def normalize_website(url):
+    """Return the website with a scheme, or "" if it does not look like a URL."""
+    url = (url or "").strip()
+    if not url or " " in url or "." not in url:
+        return ""
+    return url if re.match(r'^https?://', url, re.IGNORECASE) else f"https://{url}"
+
+@traced("company_facts")
+def fetch_company_facts(company_name, additional_info, search_fn, get_text):
+    """Run the structured facts request and return validated facts, or None.
+    
+    search_fn is search_perplexity or search_openrouter; get_text extracts
+    the response text from either provider's result.
+    """
+    print(f"Requesting structured company facts for {company_name}...")
+    result = search_fn(build_facts_query(company_name, additional_info), company_name,
+                       json_schema=get_company_facts_schema())
+    payload = parse_json_response(get_text(result)) if result else None
+    if payload is None:
+        print("Could not parse structured company facts from the response")
+        return None
+    
+    facts, errors = validate_company_facts(payload)
+    for error in errors:
+        print(f"Warning: Dropping invalid company fact {error}")
+    if "website" in facts:
+        facts["website"] = normalize_website(facts["website"])
+    return facts
+
+def generate_facts_section(facts):
+    """Return the "Company Facts" report section, or "" if there are no facts."""
+    if not facts:
+        return ""
+    
+    rows = [
+        ("Website", facts.get("website")),
+        ("Headquarters", facts.get("headquarters")),
+        ("Company Size", facts.get("company_size") if facts.get("company_size") != "unknown" else ""),
+        ("Employees", f"~{facts['employee_count']}" if facts.get("employee_count") else ""),
+        ("Remote Policy", REMOTE_POLICY_LABELS.get(facts.get("remote_policy"), "")),
+    ]
+    section = "## Company Facts\n\n"
+    for label, value in rows:
+        if value:
+            section += f"**{label}:** {value}\n\n"
+    if facts.get("description"):
+        section += f"{facts['description']}\n\n"
+    if facts.get("remote_policy_summary"):
+        section += f"*Remote policy:* {facts['remote_policy_summary']}\n\n"
+    return section
@@ -0,0 +1,267 @@
+"""Per-stage timing, token and cost spans for each research run.
+
+research_company() opens a trace for the run, and every pipeline stage
+(research queries, company facts, Hunter.io lookup, location extraction,
+cover letter, report, save and PDF) records a span with its duration and
+status. Spans around API calls also record the provider, model, prompt and
+completion tokens from the response's usage field, the estimated cost and
+how many retries the request needed. When the run is saved the spans are
+written to spans.jsonl in its artifact directory, one JSON object per line,
+and the report viewer aggregates them on its /metrics route.
+
+The trace lives in a context variable, so stages submitted to a thread pool
+must be wrapped with in_trace_context() to be recorded in the right run.
+"""
+import json
+import time
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+from artifact_store import atomic_write_text
+from http_clients import request_stats
+
+SPANS_FILENAME = "spans.jsonl"
+
+# Estimated USD per million prompt and completion tokens, used when the provider does not report a cost
+MODEL_PRICES = {
+    "sonar-pro": (3.0, 15.0),
+    "sonar": (1.0, 1.0),
+    "anthropic/claude-3-opus:beta": (15.0, 75.0),
+    "anthropic/claude-3-opus": (15.0, 75.0),
+}
+
+# Upper bounds of the stage duration histogram on /metrics, in seconds
+DURATION_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+
+_current_trace = contextvars.ContextVar("research_trace", default=None)
+
+def estimate_cost(model, usage):
+    """Return the cost of a response in USD from its usage field, or None if it is unknown."""
+    if not usage:
+        return None
+    # Some providers report the cost themselves, as a number or as a breakdown with a total
+    cost = usage.get("cost")
+    if isinstance(cost, dict):
+        cost = cost.get("total_cost")
+    if isinstance(cost, (int, float)):
+        return float(cost)
+    
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    prompt_price, completion_price = prices
+    return round((usage.get("prompt_tokens", 0) * prompt_price
+                  + usage.get("completion_tokens", 0) * completion_price) / 1_000_000, 6)
+
+class RunTrace:
+    """The spans of one research run."""
+    
+    def __init__(self, company_name):
+        self.company_name = company_name
+        self.spans = []
+        self.run = None
+        self._lock = threading.Lock()
+    
+    def add_span(self, stage, started, duration, **attrs):
+        """Record a finished span, and rewrite the spans file if the run has been saved."""
+        span = {"stage": stage, "company_name": self.company_name, "started_at": round(started, 3),
+                "duration": round(duration, 4)}
+        span.update({key: value for key, value in attrs.items() if value is not None})
+        with self._lock:
+            if self.run is not None:
+                span["run_id"] = self.run.run_id
+            self.spans.append(span)
+            if self.run is not None:
+                atomic_write_text(self.run.path / SPANS_FILENAME, self._jsonl())
+    
+    def attach(self, run):
+        """Write the spans into a saved run's directory; later spans are added to the same file."""
+        with self._lock:
+            self.run = run
+            for span in self.spans:
+                span["run_id"] = run.run_id
+            jsonl = self._jsonl()
+        run.write_text(SPANS_FILENAME, jsonl, kind="spans")
+    
+    def _jsonl(self):
+        return "".join(json.dumps(span) + "\n" for span in self.spans)
+
+def current_trace():
+    """Return the trace of the run in progress in this context, or None."""
+    return _current_trace.get()
+
+@contextmanager
+def run_trace(company_name):
+    """Collect the spans of a research run, with a "company" span around the whole run."""
+    trace = RunTrace(company_name)
+    token = _current_trace.set(trace)
+    try:
+        with span("company"):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+
+def in_trace_context(fn):
+    """Wrap a function submitted to a thread pool so its spans go to the current run."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+@contextmanager
+def span(stage, provider=None, model=None):
+    """Time a stage and record it in the current trace.
+    
+    Yields a dict for extra attributes. For stages with a provider, the
+    HTTP requests and retries made on this thread are counted too.
+    """
+    trace = current_trace()
+    attrs = {"provider": provider, "model": model}
+    requests_before = request_stats() if provider else None
+    started = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if trace is not None:
+            if requests_before:
+                requests_after = request_stats()
+                attrs["requests"] = requests_after[0] - requests_before[0]
+                attrs["retries"] = requests_after[1] - requests_before[1]
+                attrs["throttled"] = requests_after[2] - requests_before[2]
+                # An answer that needed no request came from the response cache and cost nothing
+                if attrs["requests"] == 0 and attrs.get("status", status) == "ok":
+                    attrs["cached"] = True
+                    attrs.pop("cost_usd", None)
+            attrs.setdefault("status", status)
+            trace.add_span(stage, started, time.perf_counter() - start, **attrs)
+
+def traced(stage, provider=None, model=None):
+    """Decorator recording a span around each call.
+    
+    A None result is recorded with status "no_result". For API calls, the
+    tokens and cost are read from the usage field of the returned response.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, provider, model) as attrs:
+                result = fn(*args, **kwargs)
+                if result is None:
+                    attrs["status"] = "no_result"
+                usage = result.get("usage") if provider and isinstance(result, dict) else None
+                if usage:
+                    attrs["prompt_tokens"] = usage.get("prompt_tokens")
+                    attrs["completion_tokens"] = usage.get("completion_tokens")
+                    attrs["cost_usd"] = estimate_cost(model, usage)
+                return result
+        return wrapper
+    return decorator
+
+def load_spans(path):
+    """Read a spans.jsonl file, skipping unreadable lines."""
+    spans = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return spans
+
+def _labels(**labels):
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"') for key, value in labels.items()}
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+def format_metrics(runs):
+    """Aggregate the spans of many runs into Prometheus text exposition format.
+    
+    runs is a list of span lists, one per run.
+    """
+    durations = {}
+    calls = {}
+    counters = {"requests": {}, "retries": {}, "throttled": {}}
+    tokens = {}
+    costs = {}
+    routes = {"hedged": 0, "failed_over": 0}
+    
+    for spans in runs:
+        for s in spans:
+            stage = s.get("stage", "unknown")
+            histogram = durations.setdefault(stage, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+            histogram["sum"] += s.get("duration", 0)
+            histogram["count"] += 1
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if s.get("duration", 0) <= bound:
+                    histogram["buckets"][i] += 1
+            
+            for name in routes:
+                if s.get(name):
+                    routes[name] += 1
+            provider = s.get("provider")
+            if not provider:
+                continue
+            key = (provider, stage, "cached" if s.get("cached") else s.get("status", "ok"))
+            calls[key] = calls.get(key, 0) + 1
+            for name, totals in counters.items():
+                totals[provider] = totals.get(provider, 0) + s.get(name, 0)
+            if s.get("cached"):
+                continue
+            model = s.get("model", "")
+            for kind in ("prompt", "completion"):
+                if s.get(f"{kind}_tokens"):
+                    tokens[(provider, model, kind)] = tokens.get((provider, model, kind), 0) + s[f"{kind}_tokens"]
+            if s.get("cost_usd"):
+                costs[(provider, model)] = costs.get((provider, model), 0.0) + s["cost_usd"]
+    
+    lines = [
+        "# HELP research_agent_runs_total Research runs with recorded spans.",
+        "# TYPE research_agent_runs_total counter",
+        f"research_agent_runs_total {len(runs)}",
+        "# HELP research_agent_stage_duration_seconds Duration of each pipeline stage.",
+        "# TYPE research_agent_stage_duration_seconds histogram",
+    ]
+    for stage, histogram in sorted(durations.items()):
+        for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+            lines.append(f"research_agent_stage_duration_seconds_bucket{_labels(stage=stage, le=bound)} {count}")
+        lines.append(f"research_agent_stage_duration_seconds_bucket{_labels(stage=stage, le='+Inf')} {histogram['count']}")
+        lines.append(f"research_agent_stage_duration_seconds_sum{_labels(stage=stage)} {histogram['sum']:.4f}")
+        lines.append(f"research_agent_stage_duration_seconds_count{_labels(stage=stage)} {histogram['count']}")
+    
+    lines += ["# HELP research_agent_api_calls_total API calls by provider, stage and outcome.",
+              "# TYPE research_agent_api_calls_total counter"]
+    for (provider, stage, status), count in sorted(calls.items()):
+        lines.append(f"research_agent_api_calls_total{_labels(provider=provider, stage=stage, status=status)} {count}")
+    
+    for name, description in (("requests", "HTTP requests sent, excluding retries and cache hits."),
+                              ("retries", "Requests retried after a 429, 5xx or connection error."),
+                              ("throttled", "Requests answered with 429.")):
+        lines += [f"# HELP research_agent_http_{name}_total {description}",
+                  f"# TYPE research_agent_http_{name}_total counter"]
+        for provider, count in sorted(counters[name].items()):
+            lines.append(f"research_agent_http_{name}_total{_labels(provider=provider)} {count}")
+    
+    lines += ["# HELP research_agent_hedged_queries_total Queries also sent to a second provider after the hedge threshold.",
+              "# TYPE research_agent_hedged_queries_total counter",
+              f"research_agent_hedged_queries_total {routes['hedged']}",
+              "# HELP research_agent_failovers_total Queries retried on another provider after an error or empty answer.",
+              "# TYPE research_agent_failovers_total counter",
+              f"research_agent_failovers_total {routes['failed_over']}"]
+    
+    lines += ["# HELP research_agent_tokens_total Prompt and completion tokens reported by the providers.",
+              "# TYPE research_agent_tokens_total counter"]
+    for (provider, model, kind), count in sorted(tokens.items()):
+        lines.append(f"research_agent_tokens_total{_labels(provider=provider, model=model, kind=kind)} {count}")
+    
+    lines += ["# HELP research_agent_cost_usd_total Estimated API cost in USD.",
+              "# TYPE research_agent_cost_usd_total counter"]
+    for (provider, model), cost in sorted(costs.items()):
+        lines.append(f"research_agent_cost_usd_total{_labels(provider=provider, model=model)} {cost:.6f}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,5 @@
+"""The agent modules are run as scripts, so tests import them from as-agent/."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
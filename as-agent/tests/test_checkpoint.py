@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+import company_research
+from checkpoint import open_checkpoint
+
+def test_facts_and_cover_letter_survive_an_interrupted_run(tmp_path, monkeypatch):
+    monkeypatch.setattr("checkpoint.CHECKPOINT_DIR", tmp_path)
+    monkeypatch.setattr(company_research, "STRUCTURED_EXTRACTION", True)
+    monkeypatch.setattr(company_research, "RESEARCH_QUERY_PLAN", "split")
+    
+    facts_done = threading.Event()
+    letter_done = threading.Event()
+    
+    def fetch_company_facts(company_name, additional_info, search_fn, get_text):
+        facts_done.set()
+        return {"name": company_name}
+    
+    def generate_cover_letter(company_name, interest_reason, research_data, company_facts=None):
+        letter_done.set()
+        return "## Cover Letter\n\nHello"
+    
+    def search_fn(query, company_name, **kwargs):
+        if query == queries[0]["query"]:
+            return {"text": "Overview"}
+        # The rest of the research is interrupted once the facts and the cover letter have finished
+        facts_done.wait(5)
+        letter_done.wait(5)
+        raise KeyboardInterrupt
+    
+    monkeypatch.setattr(company_research, "fetch_company_facts", fetch_company_facts)
+    monkeypatch.setattr(company_research, "generate_cover_letter", generate_cover_letter)
+    queries = company_research.generate_research_queries("Acme", "")
+    checkpoint = open_checkpoint("Acme", interest_reason="Remote work")
+    
+    with pytest.raises(KeyboardInterrupt):
+        company_research._research_company("Acme", "", "", "Remote work", queries, search_fn, None, checkpoint)
+    
+    resumed = open_checkpoint("Acme", interest_reason="Remote work", resume=True)
+    assert resumed.get("company_facts") == {"name": "Acme"}
+    assert resumed.get("facts_fetched_at")
+    assert resumed.get("cover_letter_section") == "## Cover Letter\n\nHello"
+    assert resumed.section(queries[0])["result"] == {"text": "Overview"}
@@ -0,0 +1,27 @@
+from compatibility_matrix import compute_matrix
+
+def company(name, restricted_to=(), excluded_regions=()):
+    return {"name": name, "restrictions": {
+        "restricted_to": list(restricted_to),
+        "excluded_regions": list(excluded_regions),
+        "time_zone_requirements": "",
+    }}
+
+CANDIDATES = [
+    {"name": "new-york", "location": "New York, USA", "timezone": ""},
+    {"name": "austin", "location": "Austin, Texas", "timezone": ""},
+    {"name": "san-francisco", "location": "San Francisco", "timezone": ""},
+]
+
+def test_subdivision_exclusion_only_excludes_the_subdivision():
+    matrix = compute_matrix(CANDIDATES, [company("no-california", excluded_regions=["California"])])
+    assert [row[0]["excluded"] for row in matrix["details"]] == [False, False, True]
+    assert [row[0] for row in matrix["compatible"]] == [True, True, False]
+
+def test_subdivision_restriction_only_admits_the_subdivision():
+    matrix = compute_matrix(CANDIDATES, [company("california-only", restricted_to=["California"])])
+    assert [row[0] for row in matrix["compatible"]] == [False, False, True]
+
+def test_country_restriction_admits_its_subdivisions():
+    matrix = compute_matrix(CANDIDATES, [company("us-only", restricted_to=["United States"])])
+    assert [row[0] for row in matrix["compatible"]] == [True, True, True]
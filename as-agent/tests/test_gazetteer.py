@@ -0,0 +1,41 @@
+from company_research import check_location_compatibility
+from gazetteer import get_gazetteer
+
+def restrictions(restricted_to=(), excluded_regions=()):
+    return {
+        "has_restrictions": True,
+        "restricted_to": list(restricted_to),
+        "excluded_regions": list(excluded_regions),
+        "time_zone_requirements": "",
+    }
+
+def candidate(location):
+    return {"personal_information": {"location": location, "timezone": ""}}
+
+def test_subdivision_region_resolves_to_itself_only():
+    assert get_gazetteer().resolve_region("California") == {"US-CA"}
+
+def test_subdivision_location_is_also_in_its_country():
+    assert get_gazetteer().resolve_location("Los Angeles") == {"US-CA", "US"}
+
+def test_california_exclusion_keeps_other_us_candidates():
+    excluded = restrictions(excluded_regions=["California"])
+    assert check_location_compatibility(excluded, candidate("New York, USA"))[0]
+    assert check_location_compatibility(excluded, candidate("Austin, Texas"))[0]
+    assert not check_location_compatibility(excluded, candidate("San Francisco"))[0]
+
+def test_california_restriction_does_not_admit_the_whole_us():
+    restricted = restrictions(restricted_to=["California"])
+    assert not check_location_compatibility(restricted, candidate("New York, USA"))[0]
+    assert check_location_compatibility(restricted, candidate("Los Angeles"))[0]
+
+def test_explicit_subdivision_or_country_overrides_a_city_elsewhere():
+    gazetteer = get_gazetteer()
+    assert gazetteer.resolve_location("Paris, TX") == {"US-TX", "US"}
+    assert gazetteer.resolve_location("London, Ontario") == {"CA-ON", "CA"}
+
+def test_city_in_the_named_country_is_kept():
+    gazetteer = get_gazetteer()
+    assert gazetteer.resolve_location("San Francisco, USA") == {"US-CA", "US"}
+    assert gazetteer.resolve_location("Paris, France") == {"FR"}
+    assert gazetteer.resolve_location("London") == {"GB"}
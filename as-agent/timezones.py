@@ -0,0 +1,242 @@
+"""Working-hour overlap between company time zone requirements and candidates.
+
+Company requirements such as "Eastern Time (ET)" and candidate time zones
+(an IANA name, a label like "CET", a fixed offset like "UTC+2", or inferred
+from a city in the candidate's location) are resolved to zoneinfo zones.
+Overlap is computed from each zone's local working day over a full year of
+dates, so DST transitions on either side are accounted for. Results are
+cached per zone pair, and OverlapTable precomputes the pairs for a set of
+zones so checking many companies is a table lookup.
+"""
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, available_timezones
+
+from gazetteer import get_gazetteer
+
+# Local working day used for both sides of the comparison
+WORKDAY_START_HOUR = int(os.getenv("WORKDAY_START_HOUR", "9"))
+WORKDAY_END_HOUR = int(os.getenv("WORKDAY_END_HOUR", "17"))
+
+# Minimum shared working hours for a time zone requirement to be met
+MIN_OVERLAP_HOURS = float(os.getenv("MIN_TIMEZONE_OVERLAP_HOURS", "3"))
+
+# Requirement labels and abbreviations mapped to representative zones. A
+# label covering several zones is met if the candidate overlaps any of them.
+TIME_ZONE_ALIASES = {
+    "eastern time (et)": ["America/New_York"],
+    "central time (ct)": ["America/Chicago"],
+    "mountain time (mt)": ["America/Denver"],
+    "pacific time (pt)": ["America/Los_Angeles"],
+    "us time zones": ["America/New_York", "America/Chicago", "America/Denver", "America/Los_Angeles"],
+    "uk time (gmt/bst)": ["Europe/London"],
+    "central european time (cet)": ["Europe/Berlin"],
+    "utc-based overlap window": ["UTC"],
+    "india standard time (ist)": ["Asia/Kolkata"],
+    "australian eastern time (aet)": ["Australia/Sydney"],
+    "et": ["America/New_York"], "est": ["America/New_York"], "edt": ["America/New_York"],
+    "eastern time": ["America/New_York"],
+    "ct": ["America/Chicago"], "cst": ["America/Chicago"], "cdt": ["America/Chicago"],
+    "mt": ["America/Denver"], "mst": ["America/Denver"], "mdt": ["America/Denver"],
+    "pt": ["America/Los_Angeles"], "pst": ["America/Los_Angeles"], "pdt": ["America/Los_Angeles"],
+    "pacific time": ["America/Los_Angeles"],
+    "gmt": ["Europe/London"], "bst": ["Europe/London"], "uk time": ["Europe/London"],
+    "cet": ["Europe/Berlin"], "cest": ["Europe/Berlin"], "central european time": ["Europe/Berlin"],
+    "eet": ["Europe/Athens"], "eest": ["Europe/Athens"],
+    "ist": ["Asia/Kolkata"], "india standard time": ["Asia/Kolkata"],
+    "israel time": ["Asia/Jerusalem"], "israel standard time": ["Asia/Jerusalem"], "idt": ["Asia/Jerusalem"],
+    "irish standard time": ["Europe/Dublin"],
+    "aest": ["Australia/Sydney"], "aedt": ["Australia/Sydney"],
+    "jst": ["Asia/Tokyo"], "sgt": ["Asia/Singapore"],
+    "utc": ["UTC"],
+}
+
+# Abbreviations shared by several zones. The alias above is the default; a
+# candidate whose location lies in the country of another zone gets that one.
+AMBIGUOUS_ABBREVIATIONS = {
+    "ist": ["Asia/Kolkata", "Asia/Jerusalem", "Europe/Dublin"],
+    "cst": ["America/Chicago", "Asia/Shanghai", "America/Havana"],
+    "bst": ["Europe/London", "Asia/Dhaka"],
+}
+
+FIXED_OFFSET_PATTERN = re.compile(r'^(?:utc|gmt)\s*([+-])\s*(\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def _city_index():
+    """Map lowercase city names to IANA zones, e.g. "jerusalem" -> "Asia/Jerusalem"."""
+    index = {}
+    for name in available_timezones():
+        if "/" not in name or name.startswith(("Etc/", "SystemV/")):
+            continue
+        city = name.rsplit("/", 1)[1].replace("_", " ").lower()
+        index.setdefault(city, name)
+    return index
+
+@lru_cache(maxsize=None)
+def _iana_index():
+    """Map lowercase IANA names to their canonical spelling."""
+    return {name.lower(): name for name in available_timezones()}
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """Return a tzinfo for an IANA name or a fixed UTC offset key."""
+    if name.startswith("UTC") and name != "UTC":
+        sign = 1 if name[3] == "+" else -1
+        hours, minutes = name[4:].split(":")
+        return timezone(sign * timedelta(hours=int(hours), minutes=int(minutes)))
+    return ZoneInfo(name)
+
+def resolve_time_zone(text):
+    """Resolve one time zone description to a list of zone keys, or [] if unknown."""
+    if not text:
+        return []
+    key = " ".join(text.strip().lower().split())
+    
+    if key in TIME_ZONE_ALIASES:
+        return list(TIME_ZONE_ALIASES[key])
+    
+    offset_match = FIXED_OFFSET_PATTERN.match(key)
+    if offset_match:
+        sign, hours, minutes = offset_match.groups()
+        return [f"UTC{sign}{int(hours):02d}:{minutes or '00'}"]
+    
+    # IANA names are case-sensitive, so match them through a lowercase index
+    name = _iana_index().get(key.replace(" ", "_"))
+    if name:
+        return [name]
+    
+    # Labels like "Israel Standard Time (IST)" are tried by name, then by the abbreviation in brackets
+    bracket = re.search(r'\(([^)]+)\)', key)
+    if bracket:
+        name = re.sub(r'\s*\([^)]*\)', '', key).strip()
+        if name in TIME_ZONE_ALIASES:
+            return list(TIME_ZONE_ALIASES[name])
+        return resolve_time_zone(bracket.group(1).split("/")[0])
+    return []
+
+def _ambiguous_abbreviation(text):
+    """Return the ambiguous abbreviation a time zone description relies on, or None."""
+    key = " ".join((text or "").strip().lower().split())
+    if key in AMBIGUOUS_ABBREVIATIONS:
+        return key
+    bracket = re.search(r'\(([^)]+)\)', key)
+    if bracket and not resolve_time_zone(re.sub(r'\s*\([^)]*\)', '', key).strip()):
+        abbreviation = bracket.group(1).split("/")[0].strip()
+        if abbreviation in AMBIGUOUS_ABBREVIATIONS:
+            return abbreviation
+    return None
+
+def resolve_time_zone_requirements(requirements):
+    """Resolve a comma-separated list of company time zone requirements."""
+    zones = []
+    for requirement in (requirements or "").split(","):
+        for zone in resolve_time_zone(requirement):
+            if zone not in zones:
+                zones.append(zone)
+    return zones
+
+def resolve_candidate_time_zone(candidate_timezone, candidate_location):
+    """Return the candidate's zone key from their time zone field or location."""
+    gazetteer = get_gazetteer()
+    zones = resolve_time_zone(candidate_timezone)
+    if zones:
+        # "IST" in Jerusalem, Israel is Israel Standard Time, not India Standard Time
+        abbreviation = _ambiguous_abbreviation(candidate_timezone)
+        if abbreviation and candidate_location:
+            countries = gazetteer.resolve_location(candidate_location)
+            for zone in AMBIGUOUS_ABBREVIATIONS[abbreviation]:
+                if gazetteer.country_for_zone(zone) in countries:
+                    return zone
+        return zones[0]
+    
+    # "Jerusalem, Israel" -> try each comma-separated part as a city name
+    cities = _city_index()
+    for part in (candidate_location or "").split(","):
+        zone = cities.get(part.strip().lower())
+        if zone:
+            return zone
+    
+    # Otherwise use a representative zone for the country, e.g. "Israel"
+    return gazetteer.default_zone(gazetteer.resolve_location(candidate_location))
+
+def _working_interval(zone_key, day):
+    """Return the UTC start and end of the local working day in a zone."""
+    tz = get_zone(zone_key)
+    start = datetime.combine(day, time(WORKDAY_START_HOUR), tzinfo=tz).astimezone(timezone.utc)
+    end = datetime.combine(day, time(WORKDAY_END_HOUR), tzinfo=tz).astimezone(timezone.utc)
+    return start, end
+
+@lru_cache(maxsize=4096)
+def overlap_stats(zone_a, zone_b, year=None):
+    """Return (minimum, average) daily working-hour overlap between two zones over a year.
+    
+    Each day of zone_a is compared with the previous, same and next local day
+    of zone_b, so zones on opposite sides of the date line are handled.
+    """
+    if zone_a == zone_b:
+        hours = float(WORKDAY_END_HOUR - WORKDAY_START_HOUR)
+        return hours, hours
+    
+    first_day = date(year or date.today().year, 1, 1)
+    daily = []
+    for offset in range(365):
+        day = first_day + timedelta(days=offset)
+        a_start, a_end = _working_interval(zone_a, day)
+        best = 0.0
+        for shift in (-1, 0, 1):
+            b_start, b_end = _working_interval(zone_b, day + timedelta(days=shift))
+            shared = (min(a_end, b_end) - max(a_start, b_start)).total_seconds() / 3600
+            best = max(best, shared)
+        daily.append(best)
+    return min(daily), sum(daily) / len(daily)
+
+class OverlapTable:
+    """Precomputed worst-case overlap hours between every pair of a set of zones."""
+    
+    def __init__(self, zones):
+        self.zones = sorted(set(zones))
+        self.index = {zone: i for i, zone in enumerate(self.zones)}
+        self.hours = [[overlap_stats(a, b)[0] for b in self.zones] for a in self.zones]
+    
+    def lookup(self, zone_a, zone_b):
+        """Return the minimum overlap in hours, computing it if the pair is not in the table."""
+        if zone_a in self.index and zone_b in self.index:
+            return self.hours[self.index[zone_a]][self.index[zone_b]]
+        return overlap_stats(zone_a, zone_b)[0]
+    
+    def best(self, candidate_zone, company_zones):
+        """Return (zone, hours) for the company zone with the most overlap."""
+        return best_overlap(candidate_zone, company_zones, self.lookup)
+
+def best_overlap(candidate_zone, company_zones, lookup=None):
+    """Return (zone, hours) for the company zone with the most worst-case overlap."""
+    lookup = lookup or (lambda a, b: overlap_stats(a, b)[0])
+    best_zone, best_hours = None, 0.0
+    for zone in company_zones:
+        hours = lookup(candidate_zone, zone)
+        if best_zone is None or hours > best_hours:
+            best_zone, best_hours = zone, hours
+    return best_zone, best_hours
+
+def check_time_zone_overlap(requirements, candidate_timezone, candidate_location, min_hours=MIN_OVERLAP_HOURS):
+    """Check a candidate against company time zone requirements.
+    
+    Returns (is_compatible, overlap_hours, message). Requirements or
+    candidates that cannot be resolved are treated as compatible, with a
+    message saying so.
+    """
+    company_zones = resolve_time_zone_requirements(requirements)
+    if not company_zones:
+        return True, None, f"Could not interpret time zone requirement '{requirements}'"
+    
+    candidate_zone = resolve_candidate_time_zone(candidate_timezone, candidate_location)
+    if not candidate_zone:
+        return True, None, "Could not determine the candidate's time zone"
+    
+    best_zone, hours = best_overlap(candidate_zone, company_zones)
+    if hours >= min_hours:
+        return True, hours, f"{hours:.1f}h working-hour overlap with {best_zone}"
+    return False, hours, (f"Only {hours:.1f}h working-hour overlap between {candidate_zone} and "
+                          f"{', '.join(company_zones)} (minimum {min_hours:g}h)")
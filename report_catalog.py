@@ -0,0 +1,438 @@
+"""Persistent catalog of research reports for the report viewer.
+
+Report metadata, location restrictions and parsed sections are stored in
+SQLite, so listing reports is a single indexed query instead of a glob,
+filename regex and JSON load per report on every request. Reports are found
+through the artifact store's index of finished runs, whose manifests give
+the company, time and sidecar paths of each report; Markdown files left at
+the top of the outputs directory by older versions of the agent are still
+picked up by name. The catalog is updated incrementally: only reports whose
+mtime or size changed are parsed again, and the sources are rescanned at
+most every few seconds unless their own mtime shows something changed.
+"""
+import re
+import json
+import base64
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Reports from before the artifact store are named CompanyName_YYYYMMDD_HHMMSS.md
+REPORT_FILENAME_PATTERN = re.compile(r'(.+)_(\d{8}_\d{6})\.md')
+
+# Markdown headings that split a report into searchable sections
+SECTION_HEADING_PATTERN = re.compile(r'^#{1,4}\s+(.+?)\s*$', re.MULTILINE)
+
+# Markers wrapped around matched terms in search snippets
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+class ReportCatalog:
+    """SQLite index of the reports in an output directory."""
+    
+    def __init__(self, db_path, reports_dir, json_dir, parse_sections, rescan_interval=5.0, on_indexed=None,
+                 store=None):
+        self.db_path = Path(db_path)
+        self.reports_dir = Path(reports_dir)
+        self.json_dir = Path(json_dir)
+        # The artifact store whose index lists the agent's runs
+        self.store = store
+        self.parse_sections = parse_sections
+        # Called with the path of every report that was (re)indexed
+        self.on_indexed = on_indexed
+        self.rescan_interval = rescan_interval
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._last_scan = 0.0
+        self._dir_mtimes = None
+        
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                filename TEXT PRIMARY KEY,
+                company_name TEXT NOT NULL,
+                company_key TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                location_json TEXT,
+                location_mtime REAL,
+                has_restrictions INTEGER NOT NULL DEFAULT 0,
+                restriction_level TEXT,
+                sections_json TEXT,
+                pdf_status TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_reports_company ON reports (company_key);
+            CREATE INDEX IF NOT EXISTS idx_reports_restriction_level ON reports (restriction_level);
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('generation', 0);
+        """)
+        # Catalogs created before PDF status was tracked lack the column
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(reports)")}
+        if "pdf_status" not in columns:
+            conn.execute("ALTER TABLE reports ADD COLUMN pdf_status TEXT")
+        self.fts_enabled = self._create_search_index(conn)
+        conn.commit()
+    
+    def _connect(self):
+        """Return this thread's connection to the catalog database."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def _create_search_index(self, conn):
+        """Create the full-text index over report sections, returning False if FTS5 is unavailable."""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_text'"
+        ).fetchone()
+        if exists:
+            return True
+        
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE report_text USING fts5("
+                "filename UNINDEXED, company_name, section, body, tokenize = 'porter unicode61')"
+            )
+        except sqlite3.OperationalError as e:
+            print(f"Warning: SQLite FTS5 is not available, search will fall back to substring matching: {e}")
+            return False
+        
+        # Reports indexed before the search table existed need to be parsed again
+        conn.execute("DELETE FROM reports")
+        return True
+    
+    def _directory_mtimes(self):
+        mtimes = []
+        paths = [self.reports_dir, self.json_dir] + ([self.store.index_path] if self.store else [])
+        for path in paths:
+            try:
+                mtimes.append(path.stat().st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+    
+    def _report_sources(self):
+        """Return (filename, path, location path, company name, timestamp, PDF status) for every report on disk.
+        
+        Store runs come from one read of the index; the company name and
+        timestamp of older top-level reports are parsed from the filename.
+        """
+        sources = []
+        if self.store:
+            for manifest in self.store.read_index():
+                report_path = self.store.artifact_path(manifest, "report")
+                if report_path is None:
+                    continue
+                sources.append((
+                    report_path.name,
+                    report_path,
+                    self.store.artifact_path(manifest, "location"),
+                    manifest["company_name"],
+                    datetime.fromisoformat(manifest["created_at"]),
+                    manifest.get("pdf_status"),
+                ))
+        
+        if self.reports_dir.exists():
+            for file in self.reports_dir.glob('*.md'):
+                match = REPORT_FILENAME_PATTERN.match(file.name)
+                company_name = file.stem.replace('_', ' ')
+                timestamp = None
+                if match:
+                    company_name = match.group(1).replace('_', ' ')
+                    try:
+                        timestamp = datetime.strptime(match.group(2), "%Y%m%d_%H%M%S")
+                    except ValueError:
+                        # If timestamp parsing fails, the file creation time is used
+                        pass
+                location_path = self.json_dir / f"{file.stem}_location.json"
+                sources.append((file.name, file, location_path, company_name, timestamp, None))
+        return sources
+    
+    def refresh(self, force=False):
+        """Bring the catalog up to date with the files on disk if a rescan is due."""
+        dir_mtimes = self._directory_mtimes()
+        due = time.monotonic() - self._last_scan >= self.rescan_interval
+        if not force and not due and dir_mtimes == self._dir_mtimes:
+            return
+        
+        with self._refresh_lock:
+            self._scan()
+            self._dir_mtimes = dir_mtimes
+            self._last_scan = time.monotonic()
+    
+    def _scan(self):
+        """Parse new or changed reports and drop deleted ones."""
+        conn = self._connect()
+        known = {
+            row["filename"]: (row["mtime"], row["size"], row["location_mtime"], row["pdf_status"])
+            for row in conn.execute("SELECT filename, mtime, size, location_mtime, pdf_status FROM reports")
+        }
+        seen = set()
+        changed = False
+        
+        for filename, file, location_path, company_name, timestamp, pdf_status in self._report_sources():
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            seen.add(filename)
+            
+            location_mtime = None
+            if location_path is not None:
+                try:
+                    location_mtime = location_path.stat().st_mtime
+                except FileNotFoundError:
+                    pass
+            
+            if known.get(filename) == (stat.st_mtime, stat.st_size, location_mtime, pdf_status):
+                continue
+            self._index_report(conn, file, stat, location_path, location_mtime, company_name,
+                               timestamp or datetime.fromtimestamp(stat.st_ctime), pdf_status)
+            changed = True
+            if self.on_indexed:
+                self.on_indexed(file)
+        
+        for filename in set(known) - seen:
+            conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+            if self.fts_enabled:
+                conn.execute("DELETE FROM report_text WHERE filename = ?", (filename,))
+            changed = True
+        
+        # Bump the generation so clients can tell the catalog changed (used for ETags)
+        if changed:
+            conn.execute("UPDATE catalog_meta SET value = value + 1 WHERE key = 'generation'")
+        conn.commit()
+    
+    def _index_report(self, conn, file, stat, location_path, location_mtime, company_name, timestamp, pdf_status):
+        """Parse a single report and upsert its catalog row."""
+        location_restrictions = None
+        if location_mtime is not None:
+            try:
+                with open(location_path, 'r') as f:
+                    location_restrictions = json.load(f)
+            except Exception as e:
+                print(f"Error loading location restrictions: {e}")
+        
+        content = ""
+        try:
+            with open(file, 'r') as f:
+                content = f.read()
+            sections = self.parse_sections(content)
+        except Exception as e:
+            print(f"Error parsing report {file.name}: {e}")
+            sections = {}
+        
+        if self.fts_enabled:
+            conn.execute("DELETE FROM report_text WHERE filename = ?", (file.name,))
+            conn.executemany(
+                "INSERT INTO report_text (filename, company_name, section, body) VALUES (?, ?, ?, ?)",
+                [(file.name, company_name, title, body) for title, body in split_sections(content)]
+            )
+        
+        conn.execute(
+            "INSERT OR REPLACE INTO reports (filename, company_name, company_key, timestamp, path, mtime, size, "
+            "location_json, location_mtime, has_restrictions, restriction_level, sections_json, pdf_status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file.name,
+                company_name,
+                company_name.lower(),
+                timestamp.isoformat(),
+                str(file),
+                stat.st_mtime,
+                stat.st_size,
+                json.dumps(location_restrictions) if location_restrictions is not None else None,
+                location_mtime,
+                1 if location_restrictions and location_restrictions.get("has_restrictions") else 0,
+                (location_restrictions or {}).get("restriction_level"),
+                json.dumps(sections),
+                pdf_status,
+            )
+        )
+    
+    def _row_to_report(self, row):
+        return {
+            'filename': row["filename"],
+            'company_name': row["company_name"],
+            'timestamp': datetime.fromisoformat(row["timestamp"]),
+            'path': row["path"],
+            'location_restrictions': json.loads(row["location_json"]) if row["location_json"] else None,
+            'pdf_status': row["pdf_status"],
+        }
+    
+    def list_reports(self, sort_by='date', reverse=True):
+        """Return every report, sorted by date or company name."""
+        self.refresh()
+        column = "timestamp" if sort_by == 'date' else "company_key"
+        direction = "DESC" if reverse else "ASC"
+        rows = self._connect().execute(
+            f"SELECT * FROM reports ORDER BY {column} {direction}, filename {direction}"
+        )
+        return [self._row_to_report(row) for row in rows]
+    
+    def generation(self):
+        """Return a counter that increases every time the catalog changes."""
+        self.refresh()
+        row = self._connect().execute("SELECT value FROM catalog_meta WHERE key = 'generation'").fetchone()
+        return row["value"] if row else 0
+    
+    def query_reports(self, sort_by='date', reverse=True, limit=50, cursor=None, company=None,
+                      date_from=None, date_to=None, restriction_level=None, has_restrictions=None):
+        """Return one page of reports matching the filters, and the cursor for the next page.
+        
+        Pagination is keyset-based: the cursor encodes the sort value and
+        filename of the last report on the page, so each page is a single
+        indexed range query no matter how deep the client pages.
+        """
+        self.refresh()
+        column = "timestamp" if sort_by == 'date' else "company_key"
+        direction = "DESC" if reverse else "ASC"
+        comparison = "<" if reverse else ">"
+        
+        conditions = []
+        params = []
+        if company:
+            conditions.append("company_key LIKE ?")
+            params.append(f"%{company.lower()}%")
+        if date_from:
+            conditions.append("timestamp >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append("timestamp < ?")
+            params.append(date_to.isoformat())
+        if restriction_level:
+            conditions.append("restriction_level = ?")
+            params.append(restriction_level)
+        if has_restrictions is not None:
+            conditions.append("has_restrictions = ?")
+            params.append(1 if has_restrictions else 0)
+        if cursor:
+            last_value, last_filename = decode_cursor(cursor)
+            conditions.append(f"({column}, filename) {comparison} (?, ?)")
+            params.extend([last_value, last_filename])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM reports {where} ORDER BY {column} {direction}, filename {direction} LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][column], rows[-1]["filename"])
+        
+        return [self._row_to_report(row) for row in rows], next_cursor
+    
+    def search(self, query, limit=20):
+        """Return the best matching report sections for a full-text query.
+        
+        Each hit has the report's filename, company name, the section title,
+        a snippet with matches wrapped in SNIPPET_START/SNIPPET_END and a
+        relevance score (lower is better).
+        """
+        self.refresh()
+        conn = self._connect()
+        
+        if self.fts_enabled:
+            match_query = build_match_query(query)
+            if not match_query:
+                return []
+            rows = conn.execute(
+                "SELECT filename, company_name, section, "
+                "snippet(report_text, 3, ?, ?, '…', 16) AS snippet, bm25(report_text) AS score "
+                "FROM report_text WHERE report_text MATCH ? ORDER BY score LIMIT ?",
+                (SNIPPET_START, SNIPPET_END, match_query, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        
+        # Without FTS5, fall back to a substring scan over the stored reports
+        hits = []
+        needle = query.lower().strip()
+        if not needle:
+            return hits
+        for row in conn.execute("SELECT filename, company_name, path FROM reports"):
+            try:
+                with open(row["path"], 'r') as f:
+                    content = f.read()
+            except OSError:
+                continue
+            for title, body in split_sections(content):
+                position = body.lower().find(needle)
+                if position == -1:
+                    continue
+                start = max(0, position - 80)
+                end = position + len(needle)
+                snippet = (body[start:position] + SNIPPET_START + body[position:end] + SNIPPET_END +
+                           body[end:end + 80])
+                hits.append({'filename': row["filename"], 'company_name': row["company_name"],
+                             'section': title, 'snippet': snippet, 'score': 0.0})
+                if len(hits) >= limit:
+                    return hits
+        return hits
+    
+    def get_report(self, filename):
+        """Return a single report with its parsed sections, or None."""
+        self.refresh()
+        row = self._connect().execute("SELECT * FROM reports WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            return None
+        report = self._row_to_report(row)
+        report['sections'] = json.loads(row["sections_json"]) if row["sections_json"] else {}
+        return report
+
+def split_sections(content):
+    """Split a markdown report into (heading, body) pairs."""
+    sections = []
+    matches = list(SECTION_HEADING_PATTERN.finditer(content))
+    
+    # Text before the first heading is indexed under the report title
+    preamble = content[:matches[0].start()] if matches else content
+    if preamble.strip():
+        sections.append(("", preamble.strip()))
+    
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        body = content[match.end():end].strip()
+        title = match.group(1).strip('* ')
+        if body or title:
+            sections.append((title, body))
+    return sections
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query that matches all of its terms.
+    
+    Quoted phrases are kept together and every other word is quoted on its
+    own, so punctuation such as hyphens cannot produce FTS5 syntax errors.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        term = (phrase or word).replace('"', '').strip()
+        if term:
+            terms.append(f'"{term}"')
+    return " ".join(terms)
+
+def encode_cursor(sort_value, filename):
+    """Encode a pagination position as an opaque URL-safe string."""
+    raw = json.dumps([sort_value, filename]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor(), raising ValueError if it is invalid."""
+    try:
+        sort_value, filename = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return sort_value, filename
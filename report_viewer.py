@@ -1,13 +1,25 @@
 #!/usr/bin/env python3
 import os
 import re
+import sys
 import json
-from datetime import datetime
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, send_file, abort
 from markdown import markdown
 import bleach
 from bleach.sanitizer import ALLOWED_TAGS, ALLOWED_ATTRIBUTES
+from markupsafe import Markup, escape
+from report_catalog import ReportCatalog, SNIPPET_START, SNIPPET_END
+
+# The artifact store is shared with the research agent
+sys.path.insert(0, str(Path(__file__).parent / "as-agent"))
+from artifact_store import get_artifact_store
+from telemetry import SPANS_FILENAME, format_metrics, load_spans
 
 # Create new sets from the frozen sets
 allowed_tags = set(ALLOWED_TAGS)
@@ -28,57 +40,25 @@ app = Flask(__name__)
 # Constants
 OUTPUT_DIR = Path(__file__).parent / "as-agent" / "outputs"
 JSON_OUTPUT_DIR = Path(__file__).parent / "as-agent" / "outputs" / "json"
+LIVE_OUTPUT_DIR = Path(__file__).parent / "as-agent" / "outputs" / "live"
+CATALOG_PATH = Path(__file__).parent / "as-agent" / "outputs" / "cache" / "catalog.sqlite3"
+
+# Number of rendered reports kept in memory
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+
+# Render reports as soon as the catalog indexes them instead of on first view
+RENDER_PRECOMPUTE = os.getenv("RENDER_PRECOMPUTE", "0").lower() in ("1", "true", "yes")
+
+# Page sizes for /api/reports
+API_DEFAULT_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
 
 def get_reports(sort_by='date', reverse=True):
-    """Get all reports from the outputs directory."""
-    reports = []
-    
-    if not OUTPUT_DIR.exists():
-        return reports
-    
-    for file in OUTPUT_DIR.glob('*.md'):
-        # Extract company name and timestamp from filename
-        # Expected format: CompanyName_YYYYMMDD_HHMMSS.md
-        match = re.match(r'(.+)_(\d{8}_\d{6})\.md', file.name)
-        if match:
-            company_name = match.group(1).replace('_', ' ')
-            timestamp_str = match.group(2)
-            try:
-                timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                
-                # Check if there's a corresponding location restrictions JSON file
-                location_json_path = JSON_OUTPUT_DIR / f"{file.stem}_location.json"
-                location_restrictions = None
-                if location_json_path.exists():
-                    try:
-                        with open(location_json_path, 'r') as f:
-                            location_restrictions = json.load(f)
-                    except Exception as e:
-                        print(f"Error loading location restrictions: {e}")
-                
-                reports.append({
-                    'filename': file.name,
-                    'company_name': company_name,
-                    'timestamp': timestamp,
-                    'path': str(file),
-                    'location_restrictions': location_restrictions
-                })
-            except ValueError:
-                # If timestamp parsing fails, use file creation time
-                reports.append({
-                    'filename': file.name,
-                    'company_name': file.stem.replace('_', ' '),
-                    'timestamp': datetime.fromtimestamp(file.stat().st_ctime),
-                    'path': str(file)
-                })
-    
-    # Sort reports by date or company name
-    if sort_by == 'date':
-        reports.sort(key=lambda x: x['timestamp'], reverse=reverse)
-    else:  # sort by company name
-        reports.sort(key=lambda x: x['company_name'].lower(), reverse=reverse)
-    
-    return reports
+    """Get all reports from the report catalog."""
+    return catalog.list_reports(sort_by, reverse)
 
 def parse_report_content(content):
     """Parse the report content to extract sections."""
@@ -123,52 +103,133 @@ def extract_emails(content):
     email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
     return re.findall(email_pattern, content)
 
+class RenderCache:
+    """Bounded LRU cache of rendered reports keyed on (path, mtime, size)."""
+    
+    def __init__(self, max_entries=RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            # Drop any older render of the same file
+            for stale_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+                del self._entries[stale_key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+render_cache = RenderCache()
+
+def render_report(file_path):
+    """Return the sanitized HTML, sections and emails for a report, rendering it only if it changed."""
+    stat = file_path.stat()
+    key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+    
+    rendered = render_cache.get(key)
+    if rendered is not None:
+        return rendered
+    
+    with open(file_path, 'r') as f:
+        content = f.read()
+    
+    rendered = {
+        'html_content': render_markdown(content),
+        'sections': parse_report_content(content),
+        'emails': extract_emails(content)
+    }
+    render_cache.put(key, rendered)
+    return rendered
+
+def precompute_render(file_path):
+    """Render a newly indexed report ahead of its first view."""
+    if not RENDER_PRECOMPUTE:
+        return
+    try:
+        render_report(file_path)
+    except Exception as e:
+        print(f"Error pre-rendering report {file_path}: {e}")
+
 def get_location_restrictions_json(filename):
     """Get location restrictions JSON for a report."""
-    base_name = filename.rsplit('.', 1)[0]  # Remove extension
-    json_path = JSON_OUTPUT_DIR / f"{base_name}_location.json"
+    report = catalog.get_report(filename)
+    return report['location_restrictions'] if report else None
+
+# Indexed report metadata, refreshed incrementally from the outputs directory
+catalog = ReportCatalog(CATALOG_PATH, OUTPUT_DIR, JSON_OUTPUT_DIR, parse_report_content,
+                        on_indexed=precompute_render, store=get_artifact_store())
+
+def get_live_reports():
+    """Get reports that are being streamed by a research run, newest first."""
+    live_reports = []
     
-    if json_path.exists():
+    if not LIVE_OUTPUT_DIR.exists():
+        return live_reports
+    
+    for status_file in LIVE_OUTPUT_DIR.glob('*.status.json'):
         try:
-            with open(json_path, 'r') as f:
-                return json.load(f)
+            with open(status_file, 'r') as f:
+                status = json.load(f)
         except Exception as e:
-            print(f"Error loading location restrictions: {e}")
+            print(f"Error loading live report status: {e}")
+            continue
+        
+        status['filename'] = status_file.name[:-len('.status.json')] + '.md'
+        status['updated_at'] = datetime.fromtimestamp(status.get('updated_at', status_file.stat().st_mtime))
+        live_reports.append(status)
     
+    live_reports.sort(key=lambda x: x['updated_at'], reverse=True)
+    return live_reports
+
+def get_live_status(filename):
+    """Get the status of a live report."""
+    status_path = LIVE_OUTPUT_DIR / (filename.rsplit('.', 1)[0] + '.status.json')
+    if status_path.exists():
+        try:
+            with open(status_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading live report status: {e}")
     return None
 
+def render_markdown(content):
+    """Convert markdown to sanitized HTML."""
+    html_content = markdown(content, extensions=['tables', 'fenced_code'])
+    return bleach.clean(html_content, tags=allowed_tags, attributes=allowed_attributes)
+
 @app.route('/')
 def index():
     sort_by = request.args.get('sort', 'date')
     reverse = request.args.get('order', 'desc') == 'desc'
     reports = get_reports(sort_by, reverse)
-    return render_template('index.html', reports=reports, sort_by=sort_by, order='desc' if reverse else 'asc')
+    live_reports = [report for report in get_live_reports() if report.get('state') == 'running']
+    return render_template('index.html', reports=reports, live_reports=live_reports,
+                           sort_by=sort_by, order='desc' if reverse else 'asc')
 
 @app.route('/report/<filename>')
 def view_report(filename):
-    file_path = OUTPUT_DIR / filename
+    report = catalog.get_report(filename)
+    file_path = Path(report['path']) if report else None
     
-    if not file_path.exists():
+    if file_path is None or not file_path.exists():
         return redirect(url_for('index'))
     
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Parse the content to extract sections
-    sections = parse_report_content(content)
+    # Rendered HTML, sections and emails are cached until the file changes
+    rendered = render_report(file_path)
+    sections = rendered['sections']
     
     # Get location restrictions JSON
     location_restrictions = get_location_restrictions_json(filename)
     
-    # Convert markdown to HTML
-    html_content = markdown(content, extensions=['tables', 'fenced_code'])
-    
-    # Sanitize HTML to prevent XSS
-    html_content = bleach.clean(html_content, tags=allowed_tags, attributes=allowed_attributes)
-    
-    # Extract emails for the copyable section
-    emails = extract_emails(content)
-    
     # Get all reports for the sidebar
     all_reports = get_reports()
     
@@ -176,19 +237,199 @@ def view_report(filename):
         'report.html', 
         filename=filename,
         company_name=sections.get('company_name', 'Unknown Company'),
-        html_content=html_content,
-        emails=emails,
+        html_content=rendered['html_content'],
+        emails=rendered['emails'],
         sections=sections,
         location_restrictions=location_restrictions,
+        pdf_status=report['pdf_status'],
         reports=all_reports
     )
 
+@app.route('/report/<filename>/pdf')
+def download_pdf(filename):
+    report = catalog.get_report(filename)
+    if report is None or report['pdf_status'] != 'ready':
+        abort(404)
+    pdf_path = Path(report['path']).with_suffix('.pdf')
+    if not pdf_path.exists():
+        abort(404)
+    return send_file(pdf_path, mimetype='application/pdf', download_name=pdf_path.name)
+
+# Parsed spans files by path, reloaded when a file changes (a background PDF adds its span later)
+_spans_cache = {}
+_spans_cache_lock = threading.Lock()
+
+def get_run_spans():
+    """Return the spans of every run in the artifact store, one list per run."""
+    store = get_artifact_store()
+    runs = []
+    for manifest in store.read_index():
+        path = store.root / manifest['run_id'] / SPANS_FILENAME
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            continue
+        with _spans_cache_lock:
+            cached = _spans_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_spans(path))
+            with _spans_cache_lock:
+                _spans_cache[path] = cached
+        runs.append(cached[1])
+    return runs
+
+@app.route('/metrics')
+def metrics():
+    response = make_response(format_metrics(get_run_spans()))
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+def parse_report_filters(args):
+    """Parse the /api/reports query parameters, raising ValueError on invalid input."""
+    filters = {
+        'sort_by': args.get('sort', 'date'),
+        'reverse': args.get('order', 'desc') == 'desc',
+        'limit': min(max(int(args.get('limit', API_DEFAULT_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE),
+        'cursor': args.get('cursor') or None,
+        'company': args.get('company') or None,
+        'restriction_level': args.get('restriction_level') or None,
+        'has_restrictions': None,
+        'date_from': None,
+        'date_to': None
+    }
+    
+    if args.get('has_restrictions'):
+        value = args['has_restrictions'].lower()
+        if value not in ('true', 'false', '1', '0'):
+            raise ValueError("has_restrictions must be true or false")
+        filters['has_restrictions'] = value in ('true', '1')
+    
+    # Dates are YYYY-MM-DD and date_to is inclusive
+    if args.get('date_from'):
+        filters['date_from'] = datetime.strptime(args['date_from'], "%Y-%m-%d")
+    if args.get('date_to'):
+        filters['date_to'] = datetime.strptime(args['date_to'], "%Y-%m-%d") + timedelta(days=1)
+    
+    return filters
+
+def json_response(payload, etag=None):
+    """Build a JSON response with an optional ETag, gzipped if the client accepts it."""
+    body = json.dumps(payload, default=str).encode('utf-8')
+    response = make_response(body)
+    response.mimetype = 'application/json'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.set_etag(etag)
+    
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response.set_data(gzip.compress(body))
+        response.headers['Content-Encoding'] = 'gzip'
+    
+    return response
+
 @app.route('/api/reports')
 def api_reports():
-    sort_by = request.args.get('sort', 'date')
-    reverse = request.args.get('order', 'desc') == 'desc'
-    reports = get_reports(sort_by, reverse)
-    return jsonify(reports)
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The ETag only changes when the catalog or the query changes, so pollers get cheap 304s
+    query_key = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    etag = hashlib.sha1(f"{catalog.generation()}|{query_key}".encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    try:
+        reports, next_cursor = catalog.query_reports(**filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    for report in reports:
+        report['timestamp'] = report['timestamp'].isoformat()
+    
+    return json_response({'reports': reports, 'next_cursor': next_cursor}, etag=etag)
+
+@app.route('/live/<filename>')
+def view_live_report(filename):
+    if not (LIVE_OUTPUT_DIR / filename).exists():
+        return redirect(url_for('index'))
+    
+    status = get_live_status(filename) or {}
+    return render_template(
+        'live.html',
+        filename=filename,
+        company_name=status.get('company_name', 'Unknown Company'),
+        reports=get_reports()
+    )
+
+@app.route('/api/live/<filename>')
+def api_live_report(filename):
+    file_path = LIVE_OUTPUT_DIR / filename
+    if not file_path.exists():
+        return jsonify({'error': 'Live report not found'}), 404
+    
+    status = get_live_status(filename) or {}
+    mtime = file_path.stat().st_mtime
+    
+    # Let pollers skip re-rendering when nothing has changed since their last fetch
+    since = request.args.get('since', type=float)
+    if since is not None and mtime <= since:
+        return jsonify({'state': status.get('state'), 'mtime': mtime, 'unchanged': True})
+    
+    with open(file_path, 'r') as f:
+        content = f.read()
+    
+    return jsonify({
+        'state': status.get('state'),
+        'error': status.get('error'),
+        'mtime': mtime,
+        'html': render_markdown(content)
+    })
+
+def format_snippet(snippet):
+    """Escape a search snippet and highlight its matched terms."""
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+
+def search_reports(query, limit):
+    """Run a full-text search and attach highlighted snippets to each hit."""
+    hits = catalog.search(query, limit=limit)
+    for hit in hits:
+        hit['snippet_html'] = format_snippet(hit.pop('snippet'))
+    return hits
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    hits = search_reports(query, limit=50) if query else []
+    return render_template(
+        'search.html',
+        query=query,
+        hits=hits,
+        reports=get_reports(),
+        sort_by='date',
+        order='desc'
+    )
+
+@app.route('/api/search')
+def api_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    hits = search_reports(query, limit)
+    for hit in hits:
+        hit['snippet_html'] = str(hit['snippet_html'])
+    return json_response({'query': query, 'results': hits})
 
 if __name__ == '__main__':
     # Create outputs directory if it doesn't exist